@@ -0,0 +1,195 @@
+import os
+import time
+import argparse
+import numpy as np
+from embedding_pipeline import DEFAULT_BATCH_SIZE, DEFAULT_MODEL, embed_texts
+from embedding_store import DEFAULT_DIR, EmbeddingStore
+from pr_summary import load_summaries
+from repos import repos
+
+DEFAULT_NPROBE = 8
+TRAIN_PER_LIST = 40  # training vectors per inverted list for the coarse k-means
+
+
+def normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class IVFIndex:
+    """
+    Inverted-file index over unit-length PR embeddings for cosine "find similar PRs" queries.
+    Vectors are grouped by their nearest of `nlist` k-means centroids and stored list by list
+    (CSR: `list_indptr` delimits each list in `vectors`), so a query scores the centroids,
+    then only the vectors of the `nprobe` closest lists. Every row maps back to its PR
+    through `urls`, `numbers` and `repos`.
+    """
+
+    ARRAYS = ('centroids', 'list_indptr', 'vectors', 'urls', 'numbers', 'repos')
+
+    def __init__(self, **arrays):
+        for name in self.ARRAYS:
+            setattr(self, name, arrays[name])
+        self.positions = {url: i for i, url in enumerate(self.urls.tolist())}
+
+    @classmethod
+    def build(cls, vectors, urls, numbers, repo_names, nlist=None, seed=42):
+        from sklearn.cluster import MiniBatchKMeans  # only needed to build, not to load or search an index
+
+        vectors = normalize(vectors)
+        nlist = min(len(vectors), nlist or max(1, int(np.sqrt(len(vectors)))))
+        # Centroids are trained on a sample, as usual for IVF; every vector is then assigned to one
+        sample = np.random.default_rng(seed).permutation(len(vectors))[:TRAIN_PER_LIST * nlist]
+        kmeans = MiniBatchKMeans(n_clusters=nlist, random_state=seed, batch_size=4096, n_init=1).fit(vectors[sample])
+        assignment = kmeans.predict(vectors)
+        order = np.argsort(assignment, kind="stable")
+        list_indptr = np.zeros(nlist + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assignment, minlength=nlist), out=list_indptr[1:])
+        return cls(
+            centroids=normalize(kmeans.cluster_centers_),
+            list_indptr=list_indptr,
+            vectors=np.ascontiguousarray(vectors[order]),
+            urls=np.asarray(urls)[order],
+            numbers=np.asarray(numbers, dtype=np.int64)[order],
+            repos=np.asarray(repo_names)[order],
+        )
+
+    def save(self, path):
+        np.savez(path, **{name: getattr(self, name) for name in self.ARRAYS})
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(**{name: data[name] for name in cls.ARRAYS})
+
+    def __len__(self):
+        return len(self.urls)
+
+    def search(self, query, k=10, nprobe=DEFAULT_NPROBE, exclude=None):
+        """The `k` most similar PRs to `query` (a raw embedding) as (position, cosine score) pairs, best first."""
+        query = normalize(query)
+        nprobe = min(nprobe, len(self.centroids))
+        centroid_scores = self.centroids @ query
+        probe = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe] if nprobe < len(self.centroids) else range(len(self.centroids))
+        positions, scores = [], []
+        for c in probe:
+            start, end = self.list_indptr[c], self.list_indptr[c + 1]
+            if start < end:
+                positions.append(np.arange(start, end))
+                scores.append(self.vectors[start:end] @ query)
+        if not positions:
+            return []
+        positions, scores = np.concatenate(positions), np.concatenate(scores)
+        if exclude is not None:
+            scores[positions == exclude] = -np.inf
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(positions[i]), float(scores[i])) for i in top if scores[i] > -np.inf]
+
+    def describe(self, position, score=None):
+        record = {"url": str(self.urls[position]), "number": int(self.numbers[position]), "repo": str(self.repos[position])}
+        if score is not None:
+            record["score"] = round(score, 4)
+        return record
+
+    def similar(self, url, k=10, nprobe=DEFAULT_NPROBE):
+        """PRs most similar to an indexed PR, without the PR itself."""
+        position = self.positions[url]
+        return [self.describe(i, score) for i, score in self.search(self.vectors[position], k, nprobe, exclude=position)]
+
+    def near_duplicates(self, threshold=0.95, nprobe=DEFAULT_NPROBE, k=5):
+        """Pairs of PRs of the same repo whose summaries are at least `threshold` similar (reasons 1 and 4)."""
+        pairs = []
+        for position in range(len(self)):
+            for other, score in self.search(self.vectors[position], k, nprobe, exclude=position):
+                if other > position and score >= threshold and self.repos[other] == self.repos[position]:
+                    pairs.append((self.describe(position), self.describe(other), round(score, 4)))
+        return pairs
+
+
+def index_path(model_name=DEFAULT_MODEL):
+    return os.path.join(DEFAULT_DIR, f"{model_name.replace('/', '_')}.pr_index.npz")
+
+
+def load_index(model_name=DEFAULT_MODEL):
+    """The saved PR index, or None if `ann_index.py --build` has not been run."""
+    path = index_path(model_name)
+    return IVFIndex.load(path) if os.path.exists(path) else None
+
+
+def build_index(repo_list, model_name=DEFAULT_MODEL, nlist=None, batch_size=DEFAULT_BATCH_SIZE, processes=1):
+    """Index the summaries of every scraped repo in `repo_list`, encoding the ones not in the embedding store."""
+    store = EmbeddingStore(model_name)
+    rows, urls, numbers, repo_names = [], [], [], []
+    for repo in repo_list:
+        items = load_summaries(repo)[0]
+        if not items:
+            continue
+        summaries = [item["summary"] for item in items]
+        embed_texts(store, summaries, batch_size, processes)
+        rows.append(store.lookup(summaries))
+        urls.extend(item["url"] for item in items)
+        numbers.extend(item["number"] for item in items)
+        repo_names.extend([repo] * len(items))
+    if not urls:
+        return None
+    return IVFIndex.build(store.vectors()[np.concatenate(rows)], urls, numbers, repo_names, nlist)
+
+
+def benchmark(index, queries, k, nprobe):
+    """Mean query latency and recall@k against an exact scan, for `queries` indexed PRs."""
+    rng = np.random.default_rng(0)
+    sample = rng.choice(len(index), size=min(queries, len(index)), replace=False)
+    start = time.perf_counter()
+    approximate = [index.search(index.vectors[i], k, nprobe, exclude=i) for i in sample]
+    seconds = time.perf_counter() - start
+    hits = 0
+    for i, found in zip(sample, approximate):
+        scores = index.vectors @ index.vectors[i]
+        scores[i] = -np.inf
+        exact = set(np.argpartition(-scores, k - 1)[:k].tolist())
+        hits += len(exact & {position for position, _ in found})
+    return seconds / len(sample), hits / (len(sample) * k)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or query the nearest-neighbour index of PR summaries.")
+    parser.add_argument("--build", action="store_true", help="(re)build the index from the summaries of every repo in repos.py")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--nlist", type=int, help="number of inverted lists (default: sqrt of the number of PRs)")
+    parser.add_argument("--processes", type=int, default=1, help="encoder processes for PRs not embedded yet")
+    parser.add_argument("--query", help="url of an indexed PR to find similar PRs for")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, default=DEFAULT_NPROBE)
+    parser.add_argument("--benchmark", type=int, metavar="N", help="time N queries and compare with an exact scan")
+    parser.add_argument("--duplicates", type=float, metavar="THRESHOLD", help="list same-repo PR pairs at least this similar")
+    args = parser.parse_args()
+
+    index = None if args.build else load_index(args.model)
+    if index is None:
+        start = time.perf_counter()
+        index = build_index(repos, args.model, args.nlist, processes=args.processes)
+        if index is None:
+            print("No PR summaries to index; run the scraper first.")
+            return
+        index.save(index_path(args.model))
+        print(f"Indexed {len(index)} PRs in {len(index.centroids)} lists in {time.perf_counter() - start:.1f}s, "
+              f"saved to {index_path(args.model)}")
+
+    if args.query:
+        for record in index.similar(args.query, args.k, args.nprobe):
+            print(f"{record['score']:.3f}  {record['url']}")
+    if args.benchmark:
+        latency, recall = benchmark(index, args.benchmark, args.k, args.nprobe)
+        print(f"{latency * 1e6:.0f} µs per query, recall@{args.k} {recall:.3f} (nprobe {min(args.nprobe, len(index.centroids))} of {len(index.centroids)} lists)")
+    if args.duplicates is not None:
+        pairs = index.near_duplicates(args.duplicates, args.nprobe)
+        for first, second, score in pairs:
+            print(f"{score:.3f}  {first['url']}  {second['url']}")
+        print(f"{len(pairs)} near-duplicate pairs at similarity >= {args.duplicates}")
+
+
+if __name__ == "__main__":
+    main()
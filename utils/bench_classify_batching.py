@@ -0,0 +1,70 @@
+import os
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+# Compares one-PR-per-prompt classification with multi-PR prompts: throughput, LLM requests
+# and tokens per PR. Runs against fake_llm unless --real is given, and never uses the cache:
+#   python utils/bench_classify_batching.py --batch-sizes 1 5 10 20
+if "--real" not in sys.argv:
+    os.environ["LLM_FAKE"] = "1"
+os.environ["LLM_CACHE"] = "none"
+
+import classify_PR_among_15_reasons as classify  # noqa: E402  (reads the environment at import)
+from pr_summary import json_to_summary, load_summaries  # noqa: E402
+
+DEMO_ISSUE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "example_data", "demo_extended_issue.json")
+
+
+def synthetic_items(count):
+    """Copies of the demo PR under different numbers, for when no scraped data is around."""
+    with open(DEMO_ISSUE, "r", encoding="utf-8") as f:
+        entry = json.load(f)
+    items = []
+    for i in range(count):
+        entry = dict(entry, number=entry["number"] + 1, html_url=f"https://github.com/jax-ml/jax/pull/{entry['number'] + 1}")
+        summary = json_to_summary(entry)[0]
+        items.append({"url": entry["html_url"], "summary": summary})
+    return items
+
+
+def run(items, batch_size, batch_tokens):
+    """Classify all items, returning (seconds, LLM requests, tokens, PRs without a result)."""
+    before = classify.llm.stats()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=classify.llm.concurrency) as executor:
+        if batch_size > 1:
+            batches = classify.pack_batches(items, batch_size, batch_tokens)
+            records = [record for result in executor.map(classify.classify_batch, batches) for record in result]
+        else:
+            records = list(executor.map(classify.classify_item, items))
+    seconds = time.perf_counter() - start
+    after = classify.llm.stats()
+    return seconds, after['requests'] - before['requests'], after['tokens'] - before['tokens'], len(items) - len(records)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark batched against single-PR classification prompts.")
+    parser.add_argument("--repo", default="jax-ml/jax", help="scraped repo to take PR summaries from")
+    parser.add_argument("--limit", type=int, default=200, help="PRs to classify per run")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 5, 10, 20])
+    parser.add_argument("--batch-tokens", type=int, default=classify.DEFAULT_BATCH_TOKENS)
+    parser.add_argument("--real", action="store_true", help="call the Gemini API instead of fake_llm")
+    args = parser.parse_args()
+
+    items = (load_summaries(args.repo)[0] or [])[:args.limit]
+    if not items:
+        print(f"No scraped PRs for {args.repo}, using {args.limit} copies of {DEMO_ISSUE}")
+        items = synthetic_items(args.limit)
+    print(f"{len(items)} PRs, {sum(len(item['summary']) for item in items) / len(items):,.0f} summary characters on average")
+
+    for batch_size in args.batch_sizes:
+        seconds, requests, tokens, missing = run(items, batch_size, args.batch_tokens)
+        print(f"batch size {batch_size:3}: {len(items) / seconds:7.1f} PRs/s, {requests:4} requests, "
+              f"{tokens / len(items):7.0f} tokens per PR, {missing} without a result")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+import os
+import re
+import json
+import time
+import argparse
+from collections import Counter
+from link_extractor import extract_links_batch
+
+# Compares the original two-pass link extractor with link_extractor on synthetic issues
+# rebuilt from the links recorded for jax, and lists every link whose type changed:
+#   python utils/bench_link_extractor.py --repeat 5
+LINKS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "example_data", "jax-ml_jax_links_only.json")
+FILLER = "Thanks for the report, I can reproduce this on the latest release and will take a look. " * 3
+
+
+def legacy_extract_links_from_text(string_list):
+    """The extractor as it was before the single-pass rewrite."""
+    url_pattern = r'https?://\S+'
+    issue_references_pattern = r'(?:fixes|mentioned in|resolves|closes)[\s#]*(\d+)'
+
+    urls, issue_references = [], []
+    for string in string_list:
+        urls.extend(re.findall(url_pattern, string))
+        issue_references.extend(re.findall(issue_references_pattern, string, re.IGNORECASE))
+
+    links_to = []
+    for url in urls:
+        url = url.rstrip('.,!?')
+        type = 'url'
+        if 'pull' in url:
+            type = 'pull_url'
+        elif 'issue' in url:
+            type = 'issue_url'
+        links_to.append({'link': url, 'type': type})
+
+    for issue_reference in issue_references:
+        links_to.append({'link': f'#{issue_reference}', 'type': 'Issue/PR number'})
+    return links_to
+
+
+# Ways references are written in practice; only the first two are understood by the legacy extractor
+REFERENCE_TEMPLATES = [
+    "This closes #{number}.",
+    "Mentioned in #{number}",
+    "Fixed #{number} as well.",
+    "Closed via jax-ml/jax#{number}",
+    "Duplicate of #{number}, see the discussion there.",
+    "Resolve GH-{number}",
+]
+
+
+def synthetic_issue(number, links):
+    """An issue whose body and comments mention each recorded link once, between plain prose."""
+    texts = [f"See {link['link']} for details." if link['type'] != 'Issue/PR number'
+             else REFERENCE_TEMPLATES[(int(number) + i) % len(REFERENCE_TEMPLATES)].format(number=link['link'].lstrip('#'))
+             for i, link in enumerate(links)]
+    return {
+        'number': int(number),
+        'body': FILLER + (texts[0] if texts else ""),
+        'comments_url_body': [{'body': FILLER + text} for text in texts[1:]],
+    }
+
+
+def legacy_texts(issue):
+    return [issue['body']] + [comment['body'] for comment in issue['comments_url_body']]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the link extractor against the original implementation.")
+    parser.add_argument("--links-file", default=LINKS_FILE)
+    parser.add_argument("--repeat", type=int, default=3, help="passes over the data per implementation")
+    args = parser.parse_args()
+
+    with open(args.links_file, "r", encoding="utf-8") as f:
+        issues = [synthetic_issue(number, links) for number, links in json.load(f).items()]
+    print(f"{len(issues)} issues, {sum(len(legacy_texts(issue)) for issue in issues)} texts")
+
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        legacy = [legacy_extract_links_from_text(legacy_texts(issue)) for issue in issues]
+    legacy_seconds = (time.perf_counter() - start) / args.repeat
+
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        current = extract_links_batch(issues)
+    current_seconds = (time.perf_counter() - start) / args.repeat
+
+    print(f"legacy:  {legacy_seconds * 1000:8.1f} ms per pass ({len(issues) / legacy_seconds:,.0f} issues/s)")
+    print(f"current: {current_seconds * 1000:8.1f} ms per pass ({len(issues) / current_seconds:,.0f} issues/s)")
+    print(f"speedup: {legacy_seconds / current_seconds:.2f}x")
+
+    def references(results):
+        return sum(link['type'] == 'Issue/PR number' for links in results for link in links)
+    print(f"references found: legacy {references(legacy)}, current {references(current)}")
+    print("relations:", dict(Counter(link.get('relation') for links in current for link in links)))
+
+    changes = Counter()
+    examples = {}
+    for old_links, new_links in zip(legacy, current):
+        new_types = {link['link']: link['type'] for link in new_links}
+        for link in old_links:
+            new_type = new_types.get(link['link'], 'missing')
+            if new_type != link['type']:
+                changes[(link['type'], new_type)] += 1
+                examples.setdefault((link['type'], new_type), link['link'])
+    print(f"{sum(changes.values())} links changed type:")
+    for (old_type, new_type), count in changes.most_common():
+        print(f"  {old_type} -> {new_type}: {count}  e.g. {examples[(old_type, new_type)]}")
+
+
+if __name__ == "__main__":
+    main()
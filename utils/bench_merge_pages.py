@@ -0,0 +1,89 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+from jsonl_store import write_records
+
+# Compares peak memory of the old load-everything merge with merge_pages.merge_json_files on
+# synthetic repos of increasing size. Each merge runs in a fresh interpreter so ru_maxrss
+# measures that merge alone:
+#   python utils/bench_merge_pages.py --sizes 10000 50000 100000
+REPO = "bench/synthetic"
+ISSUES_PER_PAGE = 100
+
+OLD_MERGE = """
+import os, json
+input_dir = os.path.join({scraped_dir!r}, "bench_synthetic")
+all_issues = []
+for file_name in sorted(os.listdir(input_dir)):
+    if file_name.endswith(".json") and "merged" not in file_name:
+        with open(os.path.join(input_dir, file_name)) as f:
+            all_issues.extend(json.load(f))
+with open(os.path.join(input_dir, "bench_synthetic_merged.json"), "w") as f:
+    json.dump(all_issues, f, indent=2)
+"""
+
+NEW_MERGE = """
+import sys
+sys.path.insert(0, {utils_dir!r})
+from merge_pages import merge_json_files
+merge_json_files({repo!r}, {suffix!r}, True, {scraped_dir!r})
+"""
+
+def synthetic_issue(i):
+    return {
+        'id': i, 'number': i, 'title': f"Synthetic issue {i}", 'state': 'closed',
+        'body': "Lorem ipsum dolor sit amet. " * 20,
+        'comments_url_body': [{'body': f"Comment {c} on #{i}", 'author_association': 'MEMBER',
+                               'user': {'type': 'User'}} for c in range(3)],
+    }
+
+def write_pages(scraped_dir, num_issues, suffix):
+    output_dir = os.path.join(scraped_dir, "bench_synthetic")
+    os.makedirs(output_dir, exist_ok=True)
+    for page, start in enumerate(range(0, num_issues, ISSUES_PER_PAGE), start=1):
+        issues = [synthetic_issue(i) for i in range(start, min(start + ISSUES_PER_PAGE, num_issues))]
+        output_file = os.path.join(output_dir, f"bench_synthetic_page_{page}{suffix}")
+        if suffix == ".json":
+            with open(output_file, "w") as f:
+                json.dump(issues, f, indent=2)
+        else:
+            write_records(output_file, issues)
+
+def run_measured(code):
+    """Run `code` in a child interpreter, returning (seconds, peak RSS in MB)."""
+    start = time.perf_counter()
+    child = subprocess.run([sys.executable, "-c", code + "\nimport resource\nprint(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)"],
+                           capture_output=True, text=True, check=True)
+    elapsed = time.perf_counter() - start
+    peak_kb = int(child.stdout.strip().splitlines()[-1])
+    return elapsed, peak_kb / 1024
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark peak memory of merging scraped pages.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 50000, 100000])
+    args = parser.parse_args()
+    utils_dir = os.path.dirname(os.path.abspath(__file__))
+
+    print(f"{'issues':>8} {'merge':>16} {'seconds':>8} {'peak MB':>8}")
+    for num_issues in args.sizes:
+        for label, page_suffix, code in [
+            ("old (json)", ".json", OLD_MERGE),
+            ("stream (json)", ".json", NEW_MERGE),
+            ("stream (jsonl)", ".jsonl", NEW_MERGE),
+        ]:
+            scraped_dir = tempfile.mkdtemp(prefix="bench_merge_")
+            try:
+                write_pages(scraped_dir, num_issues, page_suffix)
+                elapsed, peak_mb = run_measured(code.format(scraped_dir=scraped_dir, utils_dir=utils_dir,
+                                                            repo=REPO, suffix=page_suffix))
+            finally:
+                shutil.rmtree(scraped_dir)
+            print(f"{num_issues:>8} {label:>16} {elapsed:>8.2f} {peak_mb:>8.1f}")
+
+if __name__ == "__main__":
+    main()
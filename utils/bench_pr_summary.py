@@ -0,0 +1,135 @@
+import os
+import json
+import copy
+import time
+import argparse
+import tempfile
+import pr_summary
+from jsonl_store import iter_records, write_records
+
+# Compares the summary code as it was copied in generate_summary.py, generate_reasons.py and
+# classify_PR_among_15_reasons.py with pr_summary, on copies of the example PR given longer
+# comment threads, and times the summary store cold and warm:
+#   python utils/bench_pr_summary.py --prs 2000 --comments 30
+DEMO_ISSUE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "example_data", "demo_extended_issue.json")
+PIPELINES = 3  # scripts that each summarized every PR before the shared store
+
+
+def legacy_json_to_summary(data):
+    """json_to_summary as it was before pr_summary, building the text with +=."""
+    has_locked_reason = False
+    merged = False
+    num_comments = 0
+    num_review_comments = 0
+
+    summary = (
+        f"Pull Request '{data['number']}' titled '{data['title']}' was authored by a {data['user']['type']}, who is associated as a {data['author_association']}. "
+        f"\nIt was created at {data['created_at']}, and was closed at {data['closed_at']} {('by a ' + data['closed_by']['type']) if data.get('closed_by') else 'N/A'}.\n"
+    )
+
+    if 'labels' in data:
+        labels = data['labels']
+        if len(labels) > 0:
+            labels_text = 'The PR has labels: '
+            for i in range(len(labels)):
+                if i != len(labels)-1:
+                    labels_text += f"{labels[i]['name']} - {labels[i]['description']}, "
+                else:
+                    labels_text += f"{labels[i]['name']} - {labels[i]['description']}. "
+            summary += labels_text + '\n'
+
+    if 'locked' in data and data["locked"] and 'active_lock_reason' in data and data['active_lock_reason']:
+        has_locked_reason = True
+        summary += f"PR was locked because of {data['active_lock_reason']}.\n"
+
+    if data['body']:
+        summary += f"It has a body of '{data['body']}'\n"
+
+    if 'comments_url_body' in data and data['comments_url_body']:
+        comments = data['comments_url_body']
+        num_comments = len(comments)
+        summary += f"PR has comments:\n"
+        for i in range(num_comments):
+            summary += f"'{comments[i]['body']}' by a {comments[i]['author_association']} of type {comments[i]['user']['type']} on {comments[i]['created_at']}\n"
+        summary += '\n'
+
+    if 'pull_request' in data:
+        if data['pull_request']['merged_at']:
+            merged = True
+            summary += f"It was merged at {data['pull_request']['merged_at']} by a {data['pull_request_url_body']['merged_by']['type']}.\n "
+
+        if data['pull_request_url_body']['review_comments_url_body']:
+            review_comments = data['pull_request_url_body']['review_comments_url_body']
+            num_review_comments = len(review_comments)
+            summary += f"PR has review comments:\n"
+            for review in review_comments:
+                if review and 'user' in review and review['user']:  # Ensure review and user exist
+                    user_type = review['user'].get('type', 'Unknown')
+                    summary += f"'{review.get('body', 'No body available')}' by a {review.get('author_association', 'Unknown')} of type {user_type} on {review.get('created_at', 'Unknown date')}\n"
+            summary += '\n'
+
+    return summary.strip(), has_locked_reason, merged, num_comments, num_review_comments
+
+
+def example_prs(count, comments):
+    """Unmerged copies of the example PR, each with `comments` comments and review comments."""
+    with open(DEMO_ISSUE, "r", encoding="utf-8") as f:
+        base = json.load(f)
+    comment = {"id": 0, "body": "Could you add a test for the empty axis case? " * 4, "author_association": "MEMBER",
+               "user": {"login": "reviewer", "type": "User"}, "created_at": "2025-01-27T19:25:05Z"}
+    prs = []
+    for i in range(count):
+        pr = copy.deepcopy(base)
+        pr["number"] = base["number"] + i
+        pr["html_url"] = f"https://github.com/jax-ml/jax/pull/{pr['number']}"
+        pr["pull_request"]["merged_at"] = None
+        pr["comments_url_body"] = [dict(comment, id=i * 1000 + k) for k in range(comments)]
+        pr["pull_request_url_body"]["review_comments_url_body"] = [dict(comment, id=i * 1000 + 500 + k) for k in range(comments)]
+        prs.append(pr)
+    return prs
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pr_summary against the copied json_to_summary.")
+    parser.add_argument("--prs", type=int, default=1000)
+    parser.add_argument("--comments", type=int, default=30, help="comments and review comments per PR")
+    args = parser.parse_args()
+
+    prs = example_prs(args.prs, args.comments)
+    legacy_seconds, legacy = timed(lambda: [legacy_json_to_summary(pr) for pr in prs])
+    joined_seconds, joined = timed(lambda: [pr_summary.json_to_summary(pr) for pr in prs])
+    assert legacy == joined, "pr_summary.json_to_summary must produce the same summaries"
+    print(f"{len(prs)} PRs with {args.comments} comments and review comments each")
+    print(f"json_to_summary with +=:      {legacy_seconds * 1000:8.1f} ms")
+    print(f"json_to_summary with join:    {joined_seconds * 1000:8.1f} ms ({legacy_seconds / joined_seconds:.2f}x)")
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        input_file = os.path.join(data_dir, "jax-ml_jax.jsonl")
+        write_records(input_file, prs)
+        pr_summary.STORE_DIR = os.path.join(data_dir, "pr_summaries")
+
+        def legacy_pipeline():
+            return [legacy_json_to_summary(pr) for pr in iter_records(input_file) if pr_summary.is_analyzed_pr(pr)]
+
+        def store_pipeline():
+            return pr_summary.build_store("jax-ml/jax", data_dir=data_dir)
+
+        repeated_seconds, _ = timed(lambda: [legacy_pipeline() for _ in range(PIPELINES)])
+        cold_seconds, _ = timed(store_pipeline)
+        fresh_seconds, _ = timed(lambda: [store_pipeline() for _ in range(PIPELINES)])
+        os.utime(input_file)  # a new scrape with no changed PR: every record is re-read and re-hashed
+        rescrape_seconds, (records, _, reused) = timed(store_pipeline)
+    print(f"{PIPELINES} pipelines, each reading and summarizing the scraped data: {repeated_seconds * 1000:8.1f} ms")
+    print(f"summary store, first build:                   {cold_seconds * 1000:8.1f} ms")
+    print(f"{PIPELINES} pipelines reading the up-to-date store:  {fresh_seconds * 1000:8.1f} ms")
+    print(f"store refresh after a scrape, nothing changed: {rescrape_seconds * 1000:8.1f} ms ({reused}/{len(records)} summaries reused)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,11 @@
-import os
 import json
-import google.generativeai as genai
 from dotenv import load_dotenv
-from time import sleep
+from llm_client import create_client
 
 # Load environment variables
 load_dotenv()
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
-# Configure the Gemini API
-genai.configure(api_key=GEMINI_API_KEY)
-model = genai.GenerativeModel('gemini-1.5-pro-latest')
+llm = create_client()
 
 # Load JSON data
 input_file = "ai_accuracy/just_reasons.json"
@@ -33,18 +28,7 @@ def get_similarity_score(human_reason, predicted_reason):
     **Provide only a number between 1 and 10 as the response.**
     """
     
-    retries = 3  # Retry mechanism in case of API failure
-    for attempt in range(retries):
-        try:
-            response = model.generate_content(prompt)
-            score = int(response.text.strip())  # Ensure response is a number
-            if 1 <= score <= 10:
-                return score
-        except (ValueError, TypeError):
-            print(f"Invalid response from API. Retrying... ({attempt + 1}/{retries})")
-        sleep(2)  # Wait before retrying
-    
-    return None  # Return None for failed cases
+    return llm.generate_number(prompt, range(1, 11))  # None for failed cases
 
 # Compute similarity scores
 total_score = 0
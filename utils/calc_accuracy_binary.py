@@ -1,16 +1,11 @@
-import os
 import json
-import google.generativeai as genai
 from dotenv import load_dotenv
-from time import sleep
+from llm_client import create_client
 
 # Load environment variables
 load_dotenv()
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
-# Configure the Gemini API
-genai.configure(api_key=GEMINI_API_KEY)
-model = genai.GenerativeModel('gemini-1.5-pro-latest')
+llm = create_client()
 
 # Load JSON data
 input_file = "ai_accuracy/just_reasons.json"
@@ -31,18 +26,7 @@ def get_binary_similarity(human_reason, predicted_reason):
     **Provide only a single number (0 or 1) as the response.**
     """
     
-    retries = 3  # Retry mechanism in case of API failure
-    for attempt in range(retries):
-        try:
-            response = model.generate_content(prompt)
-            score = int(response.text.strip())  # Ensure response is a number
-            if score in [0, 1]:  
-                return score
-        except (ValueError, TypeError):
-            print(f"Invalid response from API. Retrying... ({attempt + 1}/{retries})")
-        sleep(2)  # Wait before retrying
-    
-    return None  # Return None for failed cases
+    return llm.generate_number(prompt, (0, 1))  # None for failed cases
 
 # Compute similarity scores
 correct_predictions = 0
@@ -5,9 +5,6 @@ import json
 INPUT_DIR = "ai_generated_15_reasons/analysis/repos"
 OUTPUT_FILE = "ai_generated_15_reasons/analysis/jaccard_results.json"
 
-# Ensure the output directory exists
-os.makedirs(os.path.dirname(OUTPUT_FILE), exist_ok=True)
-
 def jaccard_similarity(set1, set2):
     """Compute Jaccard similarity between two sets."""
     if not set1 and not set2:
@@ -58,7 +55,8 @@ def analyze_similarity(input_dir):
         "average_human_vs_ai": avg_human_vs_ai
     }
 
-    # Save results to JSON
+    # Save results to JSON, creating the output directory only when writing (the module is imported by local_classifier.py)
+    os.makedirs(os.path.dirname(OUTPUT_FILE), exist_ok=True)
     with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
         json.dump(results, f, indent=4)
 
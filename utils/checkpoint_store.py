@@ -0,0 +1,58 @@
+import os
+import json
+import sqlite3
+import threading
+
+
+class CheckpointStore:
+    """
+    Per-repo scraping progress in SQLite: the next page of a full crawl and the incremental
+    state (latest `updated_at`, in-progress update run). Each write is a single upsert in
+    its own transaction, so concurrent repo workers (threads or processes) never clobber
+    each other's progress the way rewriting a shared JSON file does.
+    """
+
+    def __init__(self, path, legacy_checkpoint=None, legacy_incremental=None):
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS pages (repo TEXT PRIMARY KEY, page INTEGER)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS incremental (repo TEXT PRIMARY KEY, state TEXT)")
+        self.conn.commit()
+        self._import_legacy(legacy_checkpoint, legacy_incremental)
+
+    def _import_legacy(self, checkpoint_file, incremental_file):
+        """Carry over progress from checkpoint.json / incremental.json written by older runs."""
+        for file_path, table in ((checkpoint_file, "pages"), (incremental_file, "incremental")):
+            if not file_path or not os.path.exists(file_path):
+                continue
+            with open(file_path, "r") as f:
+                legacy = json.load(f)
+            with self.lock, self.conn:
+                for repo, value in legacy.items():
+                    value = value if table == "pages" else json.dumps(value)
+                    self.conn.execute(f"INSERT OR IGNORE INTO {table} VALUES (?, ?)", (repo, value))
+            os.replace(file_path, file_path + ".imported")
+            print(f"Imported {file_path} into the checkpoint store")
+
+    def get_page(self, repo, default=1):
+        with self.lock:
+            row = self.conn.execute("SELECT page FROM pages WHERE repo = ?", (repo,)).fetchone()
+        return row[0] if row else default
+
+    def set_page(self, repo, page):
+        with self.lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO pages VALUES (?, ?)", (repo, page))
+
+    def get_state(self, repo):
+        with self.lock:
+            row = self.conn.execute("SELECT state FROM incremental WHERE repo = ?", (repo,)).fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def set_state(self, repo, state):
+        with self.lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO incremental VALUES (?, ?)", (repo, json.dumps(state)))
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -1,90 +1,31 @@
 import os
 import json
 import re
+import time
+import argparse
 from dotenv import load_dotenv
-import google.generativeai as genai
-from time import sleep
+import fewshot
+from job_runner import JobRunner, run_repos
+from link_graph import load_graph
+from llm_client import create_client, estimate_tokens
+from pr_summary import load_summaries
+from summary_budget import DEFAULT_SUMMARY_TOKENS
 from repos import repos  
 
 # Load environment variables
 load_dotenv()
 
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-genai.configure(api_key=GEMINI_API_KEY)
-model = genai.GenerativeModel('gemini-1.5-pro-latest')
-
-# models = genai.list_models()
-# for m in models:
-#     print(m.name, m.supported_generation_methods)
-
-# Load JSON data from the file
-def load_json(file_path):
-    with open(file_path, "r", encoding="utf-8") as f:
-        return json.load(f)
-
-def json_to_summary(data):
-    has_locked_reason = False
-    merged = False
-    num_comments = 0
-    num_review_comments = 0
-    url = data["html_url"]
-
-    summary = (
-        f"Pull Request '{data['number']}' titled '{data['title']}' was authored by a {data['user']['type']}, who is associated as a {data['author_association']}. "
-        f"\nIt was created at {data['created_at']}, and was closed at {data['closed_at']} {('by a ' + data['closed_by']['type']) if data.get('closed_by') else 'N/A'}.\n"
-    )
-
-    if 'labels' in data:
-        labels = data['labels']
-        if len(labels) > 0:
-            labels_text = 'The PR has labels: '
-            for i in range(len(labels)):
-                if i != len(labels)-1:
-                    labels_text += f"{labels[i]['name']} - {labels[i]['description']}, "
-                else:
-                    labels_text += f"{labels[i]['name']} - {labels[i]['description']}. "
-            summary += labels_text + '\n'
-
-    if 'locked' in data and data["locked"] and 'active_lock_reason' in data and data['active_lock_reason']:
-        has_locked_reason = True
-        summary += f"PR was locked because of {data['active_lock_reason']}.\n"
-
-    if data['body']:
-        summary += f"It has a body of '{data['body']}'\n"
-
-    if 'comments_url_body' in data and data['comments_url_body']:
-        comments = data['comments_url_body']
-        num_comments = len(comments)
-        summary += f"PR has comments:\n"
-        for i in range(num_comments):
-            summary += f"'{comments[i]['body']}' by a {comments[i]['author_association']} of type {comments[i]['user']['type']} on {comments[i]['created_at']}\n"
-        summary += '\n'
-
-    if 'pull_request' in data:
-        if data['pull_request']['merged_at']:
-            merged = True
-            summary += f"It was merged at {data['pull_request']['merged_at']} by a {data['pull_request_url_body']['merged_by']['type']}.\n "
-
-        # if data['pull_request']['patch_url_body']:
-        #     summary += f"The PR includes the following patch:\n{data['pull_request']['patch_url_body']}.\n"
-
-        if data['pull_request_url_body']['review_comments_url_body']:
-            review_comments = data['pull_request_url_body']['review_comments_url_body']
-            num_review_comments = len(review_comments)
-            summary += f"PR has review comments:\n"
-            for review in review_comments:
-                if review and 'user' in review and review['user']:  # Ensure review and user exist
-                    user_type = review['user'].get('type', 'Unknown')
-                    summary += f"'{review.get('body', 'No body available')}' by a {review.get('author_association', 'Unknown')} of type {user_type} on {review.get('created_at', 'Unknown date')}\n"
-            summary += '\n'
-            
-    return summary.strip(), has_locked_reason, merged, num_comments, num_review_comments, url
-
-def generate_prompt(summary):
-    return f"""
-                You are tasked with classifying the reason why a Pull Request (PR) was closed based on the provided summary. You must strictly follow the predefined classification categories below and return an array of numbers corresponding to the relevant reasons. The classification should be based on clear indicators found in the summary, including PR discussions, review comments, labels, and metadata.
+# Concurrency and RPM/TPM limits come from LLM_CONCURRENCY, LLM_RPM and LLM_TPM, the response
+# cache from LLM_CACHE (LLM_REPLAY=1 answers only from the cache)
+llm = create_client()
+selector = None  # fewshot.FewShotSelector for --few-shot, set in main()
+fast_path = None  # local_classifier.load_classifier() for --local, set in main()
+
+NUM_REASONS = 15
+DEFAULT_BATCH_TOKENS = 30000  # prompt budget of one multi-PR prompt
 
-                Classification Categories:
+# The 15-reason ontology, shared by the single-PR and the batched prompts
+CLASSIFICATION_CATEGORIES = '''Classification Categories:
                 1. Superseded or replaced by another PR: A newer or alternative PR better addresses the issue, making this PR obsolete and unnecessary. Example indicators: "a newer PR fixes this issue," "this approach has been replaced by another PR."
 
                 2. Erroneous or incorrect implementation: The PR contains incorrect logic, fundamental errors, or a misalignment with the intended solution. Example indicators: "incorrect approach," "logic is flawed," "does not work as expected."
@@ -113,7 +54,24 @@ def generate_prompt(summary):
 
                 14. Community opposition: The PR receives strong pushback from maintainers or the community due to technical, strategic, or philosophical reasons. Example indicators: "community does not support this change," "pushback from maintainers," "not a direction we want to take."
 
-                15. Other/Miscellaneous Reasons: The PR does not fit into any specific category but was still closed. Example indicators: "merged but still shows as closed," "closed for reasons not explicitly mentioned above."
+                15. Other/Miscellaneous Reasons: The PR does not fit into any specific category but was still closed. Example indicators: "merged but still shows as closed," "closed for reasons not explicitly mentioned above."'''
+
+def format_examples(examples):
+    """Labelled PRs similar to the one being classified, shown with their human answers."""
+    if not examples:
+        return ""
+    shown = "\n\n".join(f'PR summary: "{fewshot.example_summary(e)}"\nAnswer: {e["reasons"]}' for e in examples)
+    return f"""Labelled examples of similar PRs and their correct answers:
+
+{shown}
+
+"""
+
+def generate_prompt(summary, examples=None):
+    return f"""
+                You are tasked with classifying the reason why a Pull Request (PR) was closed based on the provided summary. You must strictly follow the predefined classification categories below and return an array of numbers corresponding to the relevant reasons. The classification should be based on clear indicators found in the summary, including PR discussions, review comments, labels, and metadata.
+
+                {CLASSIFICATION_CATEGORIES}
 
                 Instructions:
                 Analyze the PR summary carefully.
@@ -135,105 +93,203 @@ def generate_prompt(summary):
                 [2, 9, 11] → The PR had incorrect logic, caused test failures, and conflicted with project goals.
 
 
-            PR summary to analyze: "{summary}".
+            {format_examples(examples)}PR summary to analyze: "{summary}".
             """
 
-def call_gemini(prompts):
-    results = []
-    batch_size = 10
+def generate_batch_prompt(items):
+    summaries = json.dumps([{"url": item["url"], "summary": item["summary"]} for item in items], ensure_ascii=False, indent=1)
+    return f"""
+                You are tasked with classifying the reason why each of several Pull Requests (PRs) was closed based on the provided summaries. You must strictly follow the predefined classification categories below and return, for every PR, an array of numbers corresponding to the relevant reasons. The classification should be based on clear indicators found in each summary, including PR discussions, review comments, labels, and metadata.
 
-    for i in range(0, len(prompts), batch_size):
-        batch = prompts[i : i + batch_size]
-        try:
-            responses = [model.generate_content(p) for p in batch]
-            reasons = [resp.text.strip() if resp.text else "No response" for resp in responses]
-        except Exception as e:
-            print(f"Error during API call: {e}")
-            reasons = ["API Error"] * len(batch)
+                {CLASSIFICATION_CATEGORIES}
+
+                Instructions:
+                Analyze each PR summary separately.
 
-        results.extend(reasons)
-        sleep(2)  # Prevent hitting rate limits
+                For each PR, identify the most relevant reasons from the list above. If multiple reasons apply, include all relevant numbers.
 
-    return results
+                Return a single JSON object that maps every PR url below to its array of numbers, for example:
+                {{"https://github.com/owner/repo/pull/1": [1, 7], "https://github.com/owner/repo/pull/2": [3]}}
+
+                Include every url exactly once. Do not generate any additional text, only output the JSON object.
+
+            PR summaries to analyze (JSON list of url and summary):
+            {summaries}
+            """
+
+def parse_json_response(llm_response):
+    """Parse a JSON answer, tolerating a ```json fenced block around it."""
+    text = llm_response.strip()
+    fenced = re.match(r"^```(?:json)?\s*(.*?)\s*```$", text, re.DOTALL)
+    return json.loads(fenced.group(1) if fenced else text)
+
+def validate_reasons(value):
+    """A non-empty list of distinct reason numbers 1-15, else ValueError."""
+    if (not isinstance(value, list) or not value or len(set(value)) != len(value)
+            or not all(type(num) is int and 1 <= num <= NUM_REASONS for num in value)):
+        raise ValueError(f"not a list of reason numbers: {value!r}")
+    return value
 
 def extract_numbers(llm_response):
-    extracted_numbers = [num for num in map(int, re.findall(r'\b\d+\b', llm_response)) if 1 <= num <= 15]
-    return extracted_numbers if extracted_numbers else [15]  # Default to [15] if no valid numbers found
+    """
+    Strict parser for a single-PR answer, which must be a JSON array of reason numbers.
+    Anything else (prose, duplicates, numbers out of range) raises ValueError, so a garbled
+    answer is not mistaken for a real [15], Other.
+    """
+    try:
+        return validate_reasons(parse_json_response(llm_response))
+    except ValueError as e:
+        raise ValueError(f"unparseable answer {llm_response[:80]!r}: {e}") from e
+
+def parse_batch_response(llm_response, urls):
+    """{url: reasons} for every PR of a batch that got a valid reason list; the others are left out."""
+    try:
+        answer = parse_json_response(llm_response)
+    except ValueError:
+        return {}
+    if not isinstance(answer, dict):
+        return {}
+    parsed = {}
+    for url in urls:
+        try:
+            parsed[url] = validate_reasons(answer.get(url))
+        except ValueError:
+            pass
+    return parsed
+
+def pack_batches(items, batch_size, batch_tokens=DEFAULT_BATCH_TOKENS):
+    """Greedily pack items into batches of at most `batch_size` PRs whose prompt fits `batch_tokens`."""
+    overhead = estimate_tokens(generate_batch_prompt([]))
+    batches, batch, tokens = [], [], overhead
+    for item in items:
+        item_tokens = estimate_tokens(item["url"] + item["summary"]) + 10  # JSON keys and escaping
+        if batch and (len(batch) == batch_size or tokens + item_tokens > batch_tokens):
+            batches.append(batch)
+            batch, tokens = [], overhead
+        batch.append(item)
+        tokens += item_tokens
+    if batch:
+        batches.append(batch)
+    return batches
+
+def classify_item(item):
+    examples = selector.select(item["summary"], item["url"]) if selector else None
+    prompt = generate_prompt(item["summary"], examples)
+    try:
+        reasons = extract_numbers(llm.generate(prompt))
+    except ValueError:
+        # Ask again past the cached answer; a second unparseable answer fails the PR, which
+        # JobRunner leaves unrecorded so the next run retries it
+        reasons = extract_numbers(llm.generate(prompt, refresh=True))
+    return dict(item, predicted_reason=reasons)
+
+def classify_batch(batch):
+    """
+    Classify a batch with one multi-PR prompt. PRs missing from the answer or given an invalid
+    reason list fall back to single-PR prompts; a PR whose fallback fails is left out.
+    """
+    try:
+        parsed = parse_batch_response(llm.generate(generate_batch_prompt(batch)), [item["url"] for item in batch])
+    except Exception as e:
+        print(f"Batch prompt for {len(batch)} PRs failed ({e}), falling back to single-PR prompts")
+        parsed = None
+    records = [dict(item, predicted_reason=parsed[item["url"]]) for item in batch if parsed and item["url"] in parsed]
+    fallback = [item for item in batch if not parsed or item["url"] not in parsed]
+    if parsed is not None and fallback:
+        print(f"{len(fallback)} of {len(batch)} PRs missing or invalid in the batch answer, classifying them one by one")
+    for item in fallback:
+        try:
+            records.append(classify_item(item))
+        except Exception as e:
+            print(f"{item['url']} failed, will be retried on the next run: {e}")
+    return records
+
+def classify_repo(repo, batch_size=1, batch_tokens=DEFAULT_BATCH_TOKENS, summary_tokens=DEFAULT_SUMMARY_TOKENS):
+    """
+    Classify the unmerged, commented PRs of one repo, one PR per prompt or `batch_size` PRs per
+    prompt. Each PR is appended to a progress file as soon as it is classified, so an
+    interrupted run resumes where it stopped.
+    """
+    print(f"Started creating summary for {repo}")
+    repo_path = repo.replace("/", "_")
+    output_dir = os.path.join(os.path.dirname(__file__), "../ai_generated_15_reasons/repos")
+    output_json = os.path.join(output_dir, f"{repo_path}.json")
+    progress_file = os.path.join(output_dir, f"{repo_path}.progress.jsonl")
+
+    # Ensure the output directory exists
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+
+    # Summaries from the shared store (pr_summary.py), recomputed only for changed PRs
+    items, total = load_summaries(repo, summary_tokens)
+    if items is None:
+        print(f"Error: No scraped data found for {repo} in scraped_data/.")
+        return
+    if not items:
+        print(f"No unmerged PRs with comments for {repo}. Omitting this repo")
+        return
+
+    print(f"Generating reasons for: {len(items)} out of {total}")
+    runner = JobRunner(progress_file)
+    llm_items = items
+    if fast_path and len(runner.done) < len(items):
+        # PRs answered by a rule or a confident local prediction never reach the LLM
+        start = time.perf_counter()
+        pending = [item for item in items if item["url"] not in runner.done]
+        decided = fast_path.classify(pending, load_graph(repo))
+        runner.record([dict(item, predicted_reason=decided[item["url"]][0], classified_by=decided[item["url"]][1])
+                       for item in pending if item["url"] in decided])
+        llm_items = [item for item in items if item["url"] not in decided]
+        elapsed = time.perf_counter() - start
+        ruled = sum(classified_by.startswith("rule") for _, classified_by in decided.values())
+        print(f"{repo}: {len(decided)} of {len(pending)} PRs classified locally ({ruled} by rules, "
+              f"{len(pending) / elapsed:.0f} PRs/s), {len(pending) - len(decided)} left for the LLM")
+    if selector:
+        selector.prepare([item["summary"] for item in llm_items])
+
+    start, tokens_before = time.perf_counter(), llm.stats()['tokens']
+    if batch_size > 1:
+        completed, skipped, failed = runner.run_batches(
+            llm_items, classify_batch, lambda pending: pack_batches(pending, batch_size, batch_tokens), llm.concurrency)
+    else:
+        completed, skipped, failed = runner.run(llm_items, classify_item, llm.concurrency)
+    elapsed = time.perf_counter() - start
+    if selector:
+        selector.save()
+    print(f"{repo}: {completed} classified, {skipped} already done, {failed} failed. LLM calls: {llm.stats()}")
+    if completed:
+        # LLM totals are shared, so with --parallel-repos the per-PR figure covers all running repos
+        print(f"{repo}: {completed / elapsed:.2f} PRs/s, {(llm.stats()['tokens'] - tokens_before) / completed:.0f} tokens per PR "
+              f"({'batches of ' + str(batch_size) if batch_size > 1 else 'one PR per prompt'})")
+
+    # Save results to JSON, in input order
+    saved = runner.write_json(output_json, [item["url"] for item in items])
+    print(f"{saved} results saved to {output_json}")
 
 def main():
-    for repo in repos:
-        print(f"Started creating summary for {repo}")
-        repo_path = repo.replace("/", "_")
-        input_file = os.path.join(os.path.dirname(__file__), f"../scraped_data/{repo_path}.json")
-        output_dir = os.path.join(os.path.dirname(__file__), "../ai_generated_15_reasons/repos")
-        output_json = os.path.join(output_dir, f"{repo_path}.json")
-
-        # Ensure the output directory exists
-        if not os.path.exists(output_dir):
-            os.makedirs(output_dir)
-
-        if not os.path.exists(input_file):
-            print(f"Error: File '{input_file}' not found.")
-            return
-
-        data = load_json(input_file)
-        total = 0
-        count = 0
-        if isinstance(data, list):  # If JSON is a list of PRs, process each one
-            summary_data = []
-            for entry in data:
-                total += 1
-                num_comments = len(entry.get('comments_url_body', []))
-                if 'pull_request' in entry and entry['pull_request']:
-                    pull_request_data = entry.get('pull_request_url_body', {})
-                    review_comments = pull_request_data.get('review_comments_url_body', [])
-
-                    # Ensure review_comments is a list before calling len()
-                    if review_comments is None:
-                        num_review_comments = 0
-                    else:
-                        num_review_comments = len(review_comments)
-
-                    pull_request = entry['pull_request']
-                    if not pull_request.get('merged_at') and num_comments > 0 and num_review_comments > 0:
-                        count += 1
-                        summary_data.append(json_to_summary(entry))
-
-        else:  # If JSON contains only a single PR, process it directly
-            if 'pull_request' in data and data['pull_request'] and not data['pull_request'].get('merged_at'):
-                summary_data = [json_to_summary(data)]
-            else:
-                summary_data = []  # or handle the case where no matching PR is found
-        if summary_data:
-            summarys, has_locked_reasons_list, is_merged_list, num_comments_list, num_review_comments_list, urls = zip(*summary_data)
-        else:
-            print(f"No unmerged PRs with comments for {repo}. Omitting this repo")
-            continue
-
-        print(f"Generating reasons for: {count} out of {total}")
-
-        prompts = [generate_prompt(summary) for summary in summarys]
-
-        print("Sending requests to Gemini API...")
-        reasons = call_gemini(prompts)
-        
-        # Prepare the result data in a JSON-compatible format
-        results = [
-            {
-                "url": url,
-                "summary": summary,
-                "hasLockedReason_merged_numComments_numReviewComments": [has_locked_reason, merged, num_comments, num_review_comments],
-                "predicted_reason": extract_numbers(reason)
-            }
-            for summary, has_locked_reason, merged, num_comments, num_review_comments, url, reason in zip(summarys, has_locked_reasons_list, is_merged_list, num_comments_list, num_review_comments_list, urls, reasons)
-        ]
-
-
-        # Save results to JSON
-        with open(output_json, "w", encoding="utf-8") as f:
-            json.dump(results, f, ensure_ascii=False, indent=4)
-
-        print(f"Results saved to {output_json}")
+    parser = argparse.ArgumentParser(description="Classify why unmerged PRs were closed, among 15 reasons.")
+    parser.add_argument("--parallel-repos", type=int, default=1, help="repos classified concurrently (LLM limits are shared)")
+    parser.add_argument("--batch-size", type=int, default=1,
+                        help="PRs packed into one prompt; 1 sends the full single-PR prompt for every PR")
+    parser.add_argument("--batch-tokens", type=int, default=DEFAULT_BATCH_TOKENS, help="token budget of one batched prompt")
+    parser.add_argument("--summary-tokens", type=int, default=DEFAULT_SUMMARY_TOKENS,
+                        help="token budget of one PR summary; long threads keep the closing and maintainer comments")
+    parser.add_argument("--few-shot", type=int, default=fewshot.DEFAULT_K,
+                        help="most similar human-labelled PRs shown in each single-PR prompt (0 to disable)")
+    parser.add_argument("--local", action="store_true",
+                        help="answer PRs that rules or the local classifier (local_classifier.py) are sure about without the LLM")
+    parser.add_argument("--local-threshold", type=float,
+                        help="confidence the local classifier needs to skip the LLM (default 0.9)")
+    args = parser.parse_args()
+    global selector, fast_path
+    selector = fewshot.create_selector(args.few_shot)
+    if args.local:
+        from local_classifier import load_classifier  # scikit-learn is only needed for --local
+
+        fast_path = load_classifier(args.local_threshold)
+    run_repos(repos, lambda repo: classify_repo(repo, args.batch_size, args.batch_tokens, args.summary_tokens), args.parallel_repos)
+    if selector:
+        selector.report()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,18 +1,19 @@
-import os
+import re
 import json
-import google.generativeai as genai
+import hashlib
+import argparse
 from dotenv import load_dotenv
+from llm_client import create_client
 from collections import defaultdict
-from time import sleep
 from repos import repos  
+from link_graph import load_graph
+from job_runner import JobRunner, run_repos
+from pr_summary import load_summaries
 
 # Load environment variables
 load_dotenv()
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
-# Configure the Gemini API
-genai.configure(api_key=GEMINI_API_KEY)
-model = genai.GenerativeModel('gemini-1.5-pro-latest')
+llm = create_client()
 
 # Define the 16 unique reasons + Fallback reason 17
 unique_reasons = {
@@ -34,6 +35,8 @@ unique_reasons = {
     16: "Merged PR/ Incorrectly labeled as unmerged",
     17: "API Failure - Unable to Determine",
 }
+SUPERSEDED_REASON = 1
+PR_NUMBER_PATTERN = re.compile(r"Pull Request '(\d+)'")
 
 
 # Function to get reason number from Gemini API
@@ -64,53 +67,95 @@ def get_reason_number(summary):
     {summary}
     """
 
-    retries = 3  # Retry mechanism in case of API failure
-    for attempt in range(retries):
-        try:
-            response = model.generate_content(prompt)
-            reason_number = int(response.text.strip())  # Ensure response is a number
-            if reason_number in unique_reasons:
-                return reason_number
-        except (ValueError, TypeError):
-            print(f"Invalid response from API. Retrying... ({attempt + 1}/{retries})")
-        sleep(2)  # Wait before retrying
-
-    return 17  # Default to "API Failure - Unable to Determine" if API fails
-
-# Dictionary to count occurrences of each reason
-reason_counts = defaultdict(int)
-reason_counts[17] = 0  # Ensure reason 17 is tracked
-results = []
-
-for repo in repos:
-    # Load summaries from just_reasons.json
-    print(f"Started creating summary for {repo}")
-    repo_path = repo.replace("/", "_")
-    input_file = f"summary_with_predicted_reason/repos/{repo_path}.json"
-    output_file = f"summary_with_predicted_reason/fixed_option_reasons.json"
-
-    with open(input_file, "r", encoding="utf-8") as f:
-        data = json.load(f)
+    reason_number = llm.generate_number(prompt, unique_reasons)
+    return 17 if reason_number is None else reason_number  # 17: "API Failure - Unable to Determine"
 
-    # Process each summary
-    for item in data:
-        summary = item["summary"]
-        predicted_reason_number = get_reason_number(summary)
-        reason_counts[predicted_reason_number] += 1
+def progress_path(repo):
+    return f"summary_with_predicted_reason/progress/{repo.replace('/', '_')}.jsonl"
 
-        results.append({
+def count_repo(repo):
+    """Predict a fixed-option reason for every summary of one repo, appending each result as it completes."""
+    print(f"Started creating summary for {repo}")
+    # Summaries from the shared store (pr_summary.py) when the repo's scraped data is around
+    items = load_summaries(repo)[0]
+    if items is None:
+        # Load summaries from summary_with_predicted_reason/repos
+        repo_path = repo.replace("/", "_")
+        input_file = f"summary_with_predicted_reason/repos/{repo_path}.json"
+
+        with open(input_file, "r", encoding="utf-8") as f:
+            data = json.load(f)
+
+        items = []
+        for item in data:
+            match = PR_NUMBER_PATTERN.search(item["summary"])
+            number = int(match.group(1)) if match else None
+            # Older summary files carry no url; the PR number in the summary identifies the PR as well,
+            # and a summary without one is keyed by its own hash so it still gets a progress entry
+            url = item.get("url")
+            if not url:
+                url = (f"https://github.com/{repo}/pull/{number}" if number is not None
+                       else f"summary:{hashlib.sha1(item['summary'].encode('utf-8')).hexdigest()}")
+            items.append({"url": url, "summary": item["summary"], "number": number})
+
+    # Cross-references built by link_graph.py, to check "Superseded" against real links
+    graph = load_graph(repo)
+
+    def predict(item):
+        predicted_reason_number = get_reason_number(item["summary"])
+        result = {
             "repository": repo,
-            "summary": summary,
+            "url": item["url"],
+            "summary": item["summary"],
             "predicted_reason": unique_reasons[predicted_reason_number],
-        })
-
-# Save the results
-with open(output_file, "w", encoding="utf-8") as f:
-    json.dump(results, f, indent=4)
-
-# Save reason count statistics
-with open("summary_with_predicted_reason/reason_counts.json", "w", encoding="utf-8") as f:
-    json.dump(reason_counts, f, indent=4)
-
-print(f"Predicted reasons saved to {output_file}!")
-print(f"Reason counts saved to summary_with_predicted_reason/reason_counts.json!")
+        }
+        if graph is not None and item["number"] is not None:
+            result["superseded_by_links"] = graph.superseded_by(item["number"])
+        return result
+
+    runner = JobRunner(progress_path(repo))
+    completed, skipped, failed = runner.run(items, predict, llm.concurrency)
+    print(f"{repo}: {completed} predicted, {skipped} already done, {failed} failed")
+
+def main():
+    parser = argparse.ArgumentParser(description="Assign one of the fixed closing reasons to every PR summary.")
+    parser.add_argument("--parallel-repos", type=int, default=1, help="repos processed concurrently (LLM limits are shared)")
+    args = parser.parse_args()
+    output_file = "summary_with_predicted_reason/fixed_option_reasons.json"
+
+    run_repos(repos, count_repo, args.parallel_repos)
+
+    # Dictionary to count occurrences of each reason
+    reason_numbers = {reason: number for number, reason in unique_reasons.items()}
+    reason_counts = defaultdict(int)
+    reason_counts[17] = 0  # Ensure reason 17 is tracked
+    results = []
+    # (predicted as superseded, link graph shows a superseding PR) -> count
+    superseded_checks = defaultdict(int)
+    for repo in repos:
+        for result in JobRunner(progress_path(repo)).results():
+            predicted_reason_number = reason_numbers[result["predicted_reason"]]
+            reason_counts[predicted_reason_number] += 1
+            if "superseded_by_links" in result:
+                superseded_checks[(predicted_reason_number == SUPERSEDED_REASON, bool(result["superseded_by_links"]))] += 1
+            results.append(result)
+
+    # Save the results
+    with open(output_file, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=4)
+
+    # Save reason count statistics
+    with open("summary_with_predicted_reason/reason_counts.json", "w", encoding="utf-8") as f:
+        json.dump(reason_counts, f, indent=4)
+
+    if superseded_checks:
+        print(f"'{unique_reasons[SUPERSEDED_REASON]}' predictions backed by link data: "
+              f"{superseded_checks[(True, True)]}/{superseded_checks[(True, True)] + superseded_checks[(True, False)]}")
+        print(f"PRs with a superseding PR in the link data but another predicted reason: {superseded_checks[(False, True)]}")
+
+    print(f"Predicted reasons saved to {output_file}!")
+    print(f"Reason counts saved to summary_with_predicted_reason/reason_counts.json!")
+    print(f"LLM calls: {llm.stats()}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+import os
+import time
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from embedding_store import EmbeddingStore
+from pr_summary import load_summaries
+from repos import repos
+
+# Encodes PR paragraphs into an embedding_store.EmbeddingStore on CPU. Paragraphs are sorted
+# by length and cut into batches, so a batch pads to a similar length instead of to the
+# longest thread in the repo. Batches are spread over a process pool, each worker holding
+# its own copy of the model, and written straight into the store's memmap as they return:
+#   python utils/embedding_pipeline.py --processes 4 --batch-size 64
+DEFAULT_MODEL = 'all-MiniLM-L6-v2'
+DEFAULT_BATCH_SIZE = 64
+
+_model = None  # the worker's SentenceTransformer, loaded once per process
+_model_name = None
+
+
+def load_model(model_name, threads=None):
+    global _model, _model_name
+    from sentence_transformers import SentenceTransformer  # slow import, only paid when encoding
+
+    if threads:
+        import torch
+
+        torch.set_num_threads(threads)  # keep workers from oversubscribing the cores
+    _model = SentenceTransformer(model_name, device="cpu")
+    _model_name = model_name
+
+
+def encode_batch(indices, texts):
+    return indices, _model.encode(texts, batch_size=len(texts), convert_to_numpy=True)
+
+
+def length_buckets(texts, batch_size):
+    """Index lists of `batch_size` texts of similar length, longest first so the pool finishes evenly."""
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]), reverse=True)
+    return [order[start:start + batch_size] for start in range(0, len(order), batch_size)]
+
+
+def embed_texts(store, texts, batch_size=DEFAULT_BATCH_SIZE, processes=1):
+    """
+    Encode the texts that are not in `store` yet and commit them. Returns (encoded, seconds).
+    With processes > 1 every worker loads the model and uses cpu_count / processes threads.
+    """
+    pending = store.missing(texts)
+    if not pending:
+        return 0, 0.0
+    keys = [key for key, _ in pending]
+    pending_texts = [text for _, text in pending]
+    batches = length_buckets(pending_texts, batch_size)
+
+    start = time.perf_counter()
+    rows = None
+
+    def write(indices, vectors):
+        nonlocal rows
+        if rows is None:
+            rows = store.reserve(len(pending_texts), vectors.shape[1])
+        rows[indices] = vectors
+
+    if processes <= 1:
+        if _model_name != store.model_name:
+            load_model(store.model_name)
+        for indices in batches:
+            write(*encode_batch(indices, [pending_texts[i] for i in indices]))
+    else:
+        threads = max(1, (os.cpu_count() or 1) // processes)
+        with ProcessPoolExecutor(max_workers=processes, initializer=load_model, initargs=(store.model_name, threads)) as executor:
+            in_flight = deque()
+            for indices in batches:
+                # A bounded window keeps only a few batches of text and vectors in memory
+                if len(in_flight) >= processes * 2:
+                    write(*in_flight.popleft().result())
+                in_flight.append(executor.submit(encode_batch, indices, [pending_texts[i] for i in indices]))
+            while in_flight:
+                write(*in_flight.popleft().result())
+
+    rows.flush()
+    store.commit(keys)
+    return len(keys), time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embed the PR summaries of every repo in repos.py.")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--processes", type=int, default=max(1, (os.cpu_count() or 1) // 2))
+    args = parser.parse_args()
+
+    store = EmbeddingStore(args.model)
+    total_encoded = total_seconds = 0
+    for repo in repos:
+        items = load_summaries(repo)[0]
+        if items is None:
+            print(f"Error: No scraped data found for {repo} in scraped_data/.")
+            continue
+        encoded, seconds = embed_texts(store, [item["summary"] for item in items], args.batch_size, args.processes)
+        total_encoded += encoded
+        total_seconds += seconds
+        rate = f", {encoded / seconds:.1f} paragraphs/s" if encoded else ""
+        print(f"{repo}: {encoded} paragraphs encoded, {len(items) - encoded} already in the store{rate}")
+    if total_encoded:
+        print(f"Total: {total_encoded} paragraphs in {total_seconds:.1f}s, {total_encoded / total_seconds:.1f} paragraphs/s "
+              f"({args.processes} processes, batch size {args.batch_size})")
+    print(f"Embedding store holds {len(store)} paragraphs")
+
+
+if __name__ == "__main__":
+    main()
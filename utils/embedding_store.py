@@ -0,0 +1,120 @@
+import os
+import json
+import hashlib
+import numpy as np
+
+# Sentence embeddings of PR paragraphs, persisted so a paragraph is encoded once per model.
+# A store is three files next to each other:
+#   <stem>.f32        float32 vectors, one row per paragraph, appended to and read as a memmap
+#   <stem>.ids        paragraph hash of every row, one per line, in row order
+#   <stem>.meta.json  model name, dimension and committed row count
+# Rows are appended to the data files first and the meta file is rewritten last, so a crash
+# mid-append leaves extra bytes that are ignored (and overwritten) instead of a corrupt store.
+DEFAULT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ontology", "embeddings")
+ID_LINE_BYTES = 41  # sha1 hex digest and newline
+
+
+def text_hash(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingStore:
+    def __init__(self, model_name, directory=DEFAULT_DIR):
+        self.model_name = model_name
+        stem = os.path.join(directory, model_name.replace("/", "_"))
+        self.data_path = stem + ".f32"
+        self.ids_path = stem + ".ids"
+        self.meta_path = stem + ".meta.json"
+        os.makedirs(directory, exist_ok=True)
+        self.dim = None
+        self.ids = []
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta["model"] != model_name:
+                raise ValueError(f"{self.meta_path} holds {meta['model']} embeddings, not {model_name}")
+            self.dim = meta["dim"]
+            with open(self.ids_path, "r", encoding="utf-8") as f:
+                self.ids = [line.rstrip("\n") for _, line in zip(range(meta["count"]), f)]
+        self.rows = {key: row for row, key in enumerate(self.ids)}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, key):
+        return key in self.rows
+
+    def missing(self, texts):
+        """(hash, text) of the texts not embedded yet, each distinct text once."""
+        pending = {}
+        for text in texts:
+            key = text_hash(text)
+            if key not in self.rows and key not in pending:
+                pending[key] = text
+        return list(pending.items())
+
+    def _truncate_uncommitted(self):
+        """Drop rows and ids a crashed append left past the committed count."""
+        for path, size in ((self.data_path, len(self.ids) * self.dim * 4), (self.ids_path, len(self.ids) * ID_LINE_BYTES)):
+            if os.path.exists(path) and os.path.getsize(path) != size:
+                with open(path, "rb+") as f:
+                    f.truncate(size)
+
+    def reserve(self, count, dim):
+        """
+        A writable (count x dim) memmap over new rows after the committed ones, for encoders
+        that write their output in place; commit(keys) then makes the rows part of the store.
+        """
+        if self.dim is not None and dim != self.dim:
+            raise ValueError(f"expected {self.dim}-dimensional vectors, got {dim}")
+        self.dim = dim
+        self._truncate_uncommitted()
+        start = len(self.ids) * dim * 4
+        with open(self.data_path, "ab") as f:
+            f.truncate(start + count * dim * 4)
+        return np.memmap(self.data_path, dtype=np.float32, mode="r+", offset=start, shape=(count, dim))
+
+    def commit(self, keys):
+        """Make the reserved rows, whose paragraph hashes are `keys`, part of the store."""
+        with open(self.ids_path, "a", encoding="utf-8") as f:
+            f.writelines(key + "\n" for key in keys)
+        for key in keys:
+            self.rows[key] = len(self.ids)
+            self.ids.append(key)
+        self._write_meta()
+
+    def add(self, keys, vectors):
+        """Append `vectors` (n x dim) for the paragraph hashes `keys` and commit them."""
+        if len(keys) == 0:
+            return
+        rows = self.reserve(len(keys), vectors.shape[1])
+        rows[:] = vectors
+        rows.flush()
+        self.commit(keys)
+
+    def _write_meta(self):
+        tmp_path = self.meta_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"model": self.model_name, "dim": self.dim, "count": len(self.ids)}, f)
+        os.replace(tmp_path, self.meta_path)
+
+    def vectors(self):
+        """All committed vectors as a read-only (rows x dim) memmap, without loading them."""
+        if not self.ids:
+            return np.zeros((0, self.dim or 0), dtype=np.float32)
+        return np.memmap(self.data_path, dtype=np.float32, mode="r", shape=(len(self.ids), self.dim))
+
+    def lookup(self, texts):
+        """Row numbers of `texts`, which must all be embedded."""
+        return np.fromiter((self.rows[text_hash(text)] for text in texts), dtype=np.int64, count=len(texts))
+
+    def embed(self, texts, encode, batch_size=256):
+        """
+        Vectors of `texts` in order, calling `encode(list_of_texts)` only for the ones not in the
+        store, `batch_size` at a time so progress is committed as it goes. Returns (vectors, encoded).
+        """
+        pending = self.missing(texts)
+        for start in range(0, len(pending), batch_size):
+            chunk = pending[start:start + batch_size]
+            self.add([key for key, _ in chunk], encode([text for _, text in chunk]))
+        return np.asarray(self.vectors()[self.lookup(texts)]), len(pending)
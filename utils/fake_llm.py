@@ -0,0 +1,72 @@
+import os
+import re
+import json
+import random
+import threading
+import time
+
+# Stand-in for google.generativeai.GenerativeModel, selected with LLM_FAKE=1 (see
+# llm_client.create_model). Responses are canned and deterministic per prompt, and a
+# configurable share of calls fails with a 429 so retry and rate limiting paths get exercised:
+#   LLM_FAKE=1 LLM_FAKE_429_RATE=0.2 python utils/classify_PR_among_15_reasons.py
+DEFAULT_429_RATE = float(os.getenv("LLM_FAKE_429_RATE", 0.1))
+DEFAULT_LATENCY = float(os.getenv("LLM_FAKE_LATENCY", 0.05))  # seconds per call
+
+
+class ResourceExhausted(Exception):
+    """Same name and code as the google.api_core error Gemini raises when rate limited."""
+
+    code = 429
+
+
+class FakeUsage:
+    def __init__(self, prompt_token_count, candidates_token_count):
+        self.prompt_token_count = prompt_token_count
+        self.candidates_token_count = candidates_token_count
+        self.total_token_count = prompt_token_count + candidates_token_count
+
+
+class FakeResponse:
+    def __init__(self, text, usage_metadata):
+        self.text = text
+        self.usage_metadata = usage_metadata
+
+
+def canned_response(prompt):
+    """
+    A plausible answer for the prompts in this repo: a JSON object of reason lists for batched
+    classification prompts, a number or list of numbers when asked for one, a short reason otherwise.
+    """
+    seed = sum(prompt.encode("utf-8")) % 15 + 1
+    urls = re.findall(r'"url": "([^"]+)"', prompt)
+    if urls:
+        return json.dumps({url: [sum(url.encode("utf-8")) % 15 + 1] for url in urls})
+    if "array of numbers" in prompt:
+        return f"[{seed}]"
+    if "ONLY a number" in prompt or "only a number" in prompt:
+        return str(seed)
+    return f"The PR was closed for reason {seed}."
+
+
+class FakeModel:
+    def __init__(self, model_name="fake", responses=None, rate_limit_rate=DEFAULT_429_RATE, latency=DEFAULT_LATENCY, seed=0):
+        self.model_name = model_name
+        self.responses = responses or canned_response  # callable: prompt -> text
+        self.rate_limit_rate = rate_limit_rate
+        self.latency = latency
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.rate_limited = 0
+
+    def generate_content(self, prompt, generation_config=None):
+        with self.lock:
+            self.calls += 1
+            limited = self.random.random() < self.rate_limit_rate
+            if limited:
+                self.rate_limited += 1
+        time.sleep(self.latency)
+        if limited:
+            raise ResourceExhausted("429 Resource has been exhausted (e.g. check quota).")
+        text = self.responses(prompt)
+        return FakeResponse(text, FakeUsage(len(prompt) // 4 + 1, len(text) // 4 + 1))
@@ -0,0 +1,186 @@
+import os
+import json
+import glob
+import time
+import hashlib
+import threading
+import numpy as np
+from ann_index import IVFIndex
+from embedding_pipeline import DEFAULT_MODEL, embed_texts
+from embedding_store import DEFAULT_DIR, EmbeddingStore, text_hash
+from jsonl_store import iter_records
+from pr_summary import BASE_DIR, STORE_DIR
+from summary_budget import truncate_text
+
+# Few-shot examples for the LLM prompts, picked per PR from the human-annotated analysis files
+# instead of a fixed list: the k labelled PRs whose summaries are closest to the PR being
+# classified, found through an IVF index over their embeddings.
+ANALYSIS_DIR = os.path.join(BASE_DIR, "ai_generated_15_reasons", "analysis", "repos")
+LLM_OUTPUT_DIR = os.path.join(BASE_DIR, "ai_generated_15_reasons", "repos")
+DEFAULT_K = 3
+EXAMPLE_TOKENS = 600  # each example summary is cut to this, so examples stay a small part of the prompt
+REASON_NAMES = {
+    1: "Superseded or replaced by another PR",
+    2: "Erroneous or incorrect implementation",
+    3: "Inactive, abandoned, or withdrawn by author",
+    4: "Redundant, unnecessary, or low-value changes",
+    5: "Closed by design or intentionally",
+    6: "Miscommunication or misunderstanding",
+    7: "Outdated or no longer needed",
+    8: "Premature or not ready",
+    9: "Build or test failures",
+    10: "Unsafe, risky, or regressive changes",
+    11: "Incompatible, conflicts, or not aligning with the goals",
+    12: "Too large or out of scope",
+    13: "Violation of contribution guidelines or licensing issues",
+    14: "Community opposition",
+    15: "Other/Miscellaneous Reasons",
+}
+
+
+def summaries_by_url(filename, llm_output_dir=LLM_OUTPUT_DIR, store_dir=STORE_DIR):
+    """
+    {url: summary} for the repo of an analysis file. The analysis files keep only urls and labels
+    (get_only_needed_PRs_for_analysis.py), so the text comes from the classifier output they were
+    cut from and, where the PR is there too, from the current summary store.
+    """
+    summaries = {}
+    llm_output = os.path.join(llm_output_dir, filename)
+    if os.path.exists(llm_output):
+        with open(llm_output, "r", encoding="utf-8") as f:
+            summaries.update((entry["url"], entry["summary"]) for entry in json.load(f) if entry.get("summary"))
+    store = os.path.join(store_dir, os.path.splitext(filename)[0] + ".jsonl")
+    if os.path.exists(store):
+        summaries.update((record["url"], record["summary"]) for record in iter_records(store))
+    return summaries
+
+
+def load_labelled_examples(analysis_dir=ANALYSIS_DIR, llm_output_dir=LLM_OUTPUT_DIR):
+    """PRs of the analysis files that annotators labelled, with the union of both annotators' reasons."""
+    examples = []
+    for path in sorted(glob.glob(os.path.join(analysis_dir, "*.json"))):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if not isinstance(data, list):
+            continue  # e.g. reason_counts.json
+        summaries = summaries_by_url(os.path.basename(path), llm_output_dir)
+        missing = 0
+        for entry in data:
+            reasons = sorted(set(entry.get("human_reason_1", [])) | set(entry.get("human_reason_2", [])))
+            if not reasons:
+                continue
+            summary = entry.get("summary") or summaries.get(entry.get("url"))
+            if summary:
+                url = entry.get("url") or f"{os.path.basename(path)}#{len(examples)}"
+                examples.append({"url": url, "summary": summary, "reasons": reasons})
+            else:
+                missing += 1
+        if missing:
+            print(f"Warning: {missing} labelled PRs of {path} have no summary in {llm_output_dir} or {STORE_DIR}, "
+                  f"they are not used as examples")
+    return examples
+
+
+class FewShotSelector:
+    """
+    Picks the `k` labelled examples most similar to a PR summary. The examples' embeddings
+    come from the shared embedding store and are indexed once per example pool; selections
+    are cached in memory and on disk, keyed by the PR summary's hash.
+    """
+
+    def __init__(self, examples, k=DEFAULT_K, model_name=DEFAULT_MODEL, directory=DEFAULT_DIR, processes=1):
+        self.examples = examples
+        self.k = k
+        self.processes = processes
+        self.store = EmbeddingStore(model_name, directory)
+        pool = hashlib.sha1(json.dumps([[e["url"], e["reasons"], e["summary"]] for e in examples]).encode("utf-8")).hexdigest()[:12]
+        index_path = os.path.join(directory, f"{model_name.replace('/', '_')}.fewshot_{pool}.npz")
+        self.cache_path = os.path.join(directory, f"{model_name.replace('/', '_')}.fewshot_{pool}_k{k}.json")
+
+        if os.path.exists(index_path):
+            self.index = IVFIndex.load(index_path)
+        else:
+            summaries = [e["summary"] for e in examples]
+            embed_texts(self.store, summaries, processes=processes)
+            self.index = IVFIndex.build(self.store.vectors()[self.store.lookup(summaries)],
+                                        [e["url"] for e in examples], np.arange(len(examples)), ["examples"] * len(examples))
+            self.index.save(index_path)
+
+        self.selections = {}
+        if os.path.exists(self.cache_path):
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                self.selections = json.load(f)
+        self.new_selections = 0
+        self.calls = 0
+        self.seconds = 0.0
+        self.vectors = self.store.vectors()
+        # One selector serves every --parallel-repos thread; the store's reserve/commit is not safe to interleave
+        self.embed_lock = threading.Lock()
+
+    def prepare(self, summaries):
+        """Embed the summaries that will be asked about, in one batched pass instead of one by one."""
+        try:
+            with self.embed_lock:
+                if embed_texts(self.store, summaries, processes=self.processes)[0]:
+                    self.vectors = self.store.vectors()
+        except ImportError as e:
+            print(f"Cannot embed new summaries ({e}), their prompts are sent without retrieved examples")
+
+    def select(self, summary, exclude_url=None):
+        """The labelled examples to show with `summary`, most similar first; never the PR itself."""
+        start = time.perf_counter()
+        summary_hash = text_hash(summary)
+        key = f"{summary_hash}:{exclude_url or ''}"
+        chosen = self.selections.get(key)
+        if chosen is None:
+            row = self.store.rows.get(summary_hash)
+            if row is None or row >= len(self.vectors):
+                return []  # not embedded, see prepare()
+            query = self.vectors[row]
+            exclude = self.index.positions.get(exclude_url)
+            found = self.index.search(query, self.k, exclude=exclude)
+            chosen = [int(self.index.numbers[position]) for position, _ in found]
+            self.selections[key] = chosen
+            self.new_selections += 1
+        self.calls += 1
+        self.seconds += time.perf_counter() - start
+        return [self.examples[i] for i in chosen]
+
+    def save(self):
+        """Persist new selections, so re-runs with the same pool skip the search entirely."""
+        if self.new_selections:
+            tmp_path = self.cache_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(dict(self.selections), f)  # a copy, other repos' threads may still be adding to it
+            os.replace(tmp_path, self.cache_path)
+            self.new_selections = 0
+
+    def report(self):
+        if self.calls:
+            print(f"Few-shot selection: {self.calls} prompts, {self.seconds / self.calls * 1e6:.0f} µs per PR "
+                  f"({len(self.selections)} selections cached in {self.cache_path})")
+
+
+def create_selector(k=DEFAULT_K, processes=1):
+    """A selector over the analysis files, or None (with the reason printed) when few-shot selection is unavailable."""
+    if k <= 0:
+        return None
+    examples = load_labelled_examples()
+    if not examples:
+        print(f"No human-labelled PRs in {ANALYSIS_DIR}, prompts are sent without retrieved examples")
+        return None
+    try:
+        selector = FewShotSelector(examples, k, processes=processes)
+    except ImportError as e:  # sentence-transformers is needed to embed summaries
+        print(f"Few-shot selection disabled: {e}")
+        return None
+    print(f"Few-shot selection: {k} of {len(examples)} labelled PRs per prompt")
+    return selector
+
+
+def format_example_reasons(reasons):
+    return "; ".join(f"{number}. {REASON_NAMES[number]}" for number in reasons if number in REASON_NAMES)
+
+
+def example_summary(example):
+    return truncate_text(example["summary"], EXAMPLE_TOKENS)
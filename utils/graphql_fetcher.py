@@ -0,0 +1,193 @@
+GRAPHQL_BATCH_SIZE = 100  # issues/PRs per query
+COMMENTS_PAGE_SIZE = 100
+REVIEW_THREADS_PAGE_SIZE = 50
+THREAD_COMMENTS_PAGE_SIZE = 50
+
+COMMENT_FIELDS = """
+    databaseId url body createdAt updatedAt authorAssociation
+    author { __typename login }
+"""
+
+REVIEW_COMMENT_FIELDS = COMMENT_FIELDS + " path diffHunk"
+
+COMMENTS_CONNECTION = f"""
+    comments(first: {COMMENTS_PAGE_SIZE}, after: $cursor) {{
+        totalCount pageInfo {{ hasNextPage endCursor }}
+        nodes {{ {COMMENT_FIELDS} }}
+    }}
+"""
+
+THREAD_COMMENTS_CONNECTION = f"""
+    comments(first: {THREAD_COMMENTS_PAGE_SIZE}, after: $cursor) {{
+        pageInfo {{ hasNextPage endCursor }}
+        nodes {{ {REVIEW_COMMENT_FIELDS} }}
+    }}
+"""
+
+REVIEW_THREADS_CONNECTION = f"""
+    reviewThreads(first: {REVIEW_THREADS_PAGE_SIZE}, after: $cursor) {{
+        pageInfo {{ hasNextPage endCursor }}
+        nodes {{ id {THREAD_COMMENTS_CONNECTION.replace(', after: $cursor', '')} }}
+    }}
+"""
+
+# REST shows the user of a deleted account as "ghost"; GraphQL returns a null author
+GHOST_USER = {'login': 'ghost', 'type': 'User'}
+
+ISSUE_FIELDS = f"""
+    ... on Issue {{ id {COMMENTS_CONNECTION.replace(', after: $cursor', '')} }}
+    ... on PullRequest {{
+        id number title body url state merged mergedAt createdAt updatedAt closedAt
+        additions deletions changedFiles
+        author {{ __typename login }}
+        mergedBy {{ __typename login }}
+        {COMMENTS_CONNECTION.replace(', after: $cursor', '')}
+        {REVIEW_THREADS_CONNECTION.replace(', after: $cursor', '')}
+        commits(first: 1) {{ totalCount nodes {{ commit {{ message }} }} }}
+    }}
+"""
+
+# Follow-up queries for connections that did not fit in the first page
+MORE_COMMENTS_QUERY = f"""
+query($id: ID!, $cursor: String) {{
+    node(id: $id) {{
+        ... on Issue {{ {COMMENTS_CONNECTION} }}
+        ... on PullRequest {{ {COMMENTS_CONNECTION} }}
+    }}
+}}
+"""
+
+MORE_REVIEW_THREADS_QUERY = f"""
+query($id: ID!, $cursor: String) {{
+    node(id: $id) {{ ... on PullRequest {{ {REVIEW_THREADS_CONNECTION} }} }}
+}}
+"""
+
+MORE_THREAD_COMMENTS_QUERY = f"""
+query($id: ID!, $cursor: String) {{
+    node(id: $id) {{ ... on PullRequestReviewThread {{ {THREAD_COMMENTS_CONNECTION} }} }}
+}}
+"""
+
+
+def build_batch_query(numbers):
+    """Build one query fetching every issue/PR number in the batch through aliases."""
+    aliases = "\n".join(f"i{number}: issueOrPullRequest(number: {number}) {{ {ISSUE_FIELDS} }}" for number in numbers)
+    return f"""
+query($owner: String!, $name: String!) {{
+    repository(owner: $owner, name: $name) {{
+        {aliases}
+    }}
+}}
+"""
+
+
+def to_rest_user(actor):
+    """GraphQL actors carry their kind in __typename, REST users carry it in 'type'; no actor is a deleted user."""
+    if not actor:
+        return dict(GHOST_USER)
+    return {'login': actor['login'], 'type': actor['__typename']}
+
+
+def to_rest_comment(node):
+    comment = {
+        'id': node['databaseId'],
+        'html_url': node['url'],
+        'body': node['body'],
+        'user': to_rest_user(node['author']),
+        'created_at': node['createdAt'],
+        'updated_at': node['updatedAt'],
+        'author_association': node['authorAssociation'],
+    }
+    if 'path' in node:
+        comment['path'] = node['path']
+        comment['diff_hunk'] = node['diffHunk']
+    return comment
+
+
+def review_comments_from_threads(threads):
+    comments = [c for thread in threads for c in thread['comments']['nodes']]
+    return sorted((to_rest_comment(c) for c in comments), key=lambda c: c['created_at'])
+
+
+def fetch_remaining(run_query, query, node_id, cursor, connection):
+    """Page through the rest of a connection on a single node, returning its extra nodes."""
+    nodes = []
+    while cursor:
+        data = run_query(query, {'id': node_id, 'cursor': cursor})
+        if not data or not data.get('node'):
+            break
+        page = data['node'][connection]
+        nodes.extend(page['nodes'])
+        cursor = page['pageInfo']['endCursor'] if page['pageInfo']['hasNextPage'] else None
+    return nodes
+
+
+def to_pull_request_body(issue, node, review_threads):
+    """Rebuild the fields of the REST pull request object that downstream scripts read."""
+    pr_url = issue['pull_request']['url']
+    pr_data = {
+        'url': pr_url,
+        'html_url': node['url'],
+        'number': node['number'],
+        'state': node['state'].lower(),
+        'title': node['title'],
+        'user': to_rest_user(node['author']),
+        'body': node['body'],
+        'created_at': node['createdAt'],
+        'updated_at': node['updatedAt'],
+        'closed_at': node['closedAt'],
+        'merged_at': node['mergedAt'],
+        'merged': node['merged'],
+        'merged_by': to_rest_user(node['mergedBy']) if node['merged'] else None,
+        'commits_url': f"{pr_url}/commits",
+        'review_comments_url': f"{pr_url}/comments",
+        'comments_url': issue['comments_url'],
+        'commits': node['commits']['totalCount'],
+        'additions': node['additions'],
+        'deletions': node['deletions'],
+        'changed_files': node['changedFiles'],
+        'review_comments_url_body': review_comments_from_threads(review_threads),
+    }
+    if node['commits']['nodes']:
+        pr_data['commit_message'] = node['commits']['nodes'][0]['commit']['message']
+    return pr_data
+
+
+def fetch_page_details(repo, issues, run_query, batch_size=GRAPHQL_BATCH_SIZE):
+    """
+    GraphQL replacement for scraping.fetch_page_details: fills in 'comments_url_body' and
+    'pull_request_url_body' for a page of REST issues with one query per `batch_size` issues,
+    plus follow-up queries only for threads longer than one page.
+    `run_query(query, variables)` returns the response 'data' or None on failure.
+    """
+    owner, name = repo.split("/")
+    for start in range(0, len(issues), batch_size):
+        batch = issues[start:start + batch_size]
+        data = run_query(build_batch_query([issue['number'] for issue in batch]), {'owner': owner, 'name': name})
+        if not data or not data.get('repository'):
+            continue
+
+        for issue in batch:
+            node = data['repository'].get(f"i{issue['number']}")
+            if not node:
+                continue
+
+            comments = node['comments']['nodes']
+            if node['comments']['pageInfo']['hasNextPage']:
+                comments += fetch_remaining(run_query, MORE_COMMENTS_QUERY, node['id'],
+                                            node['comments']['pageInfo']['endCursor'], 'comments')
+            if comments:
+                issue['comments_url_body'] = [to_rest_comment(c) for c in comments]
+
+            if 'pull_request' in issue and 'url' in issue['pull_request'] and 'reviewThreads' in node:
+                threads = node['reviewThreads']['nodes']
+                if node['reviewThreads']['pageInfo']['hasNextPage']:
+                    threads += fetch_remaining(run_query, MORE_REVIEW_THREADS_QUERY, node['id'],
+                                               node['reviewThreads']['pageInfo']['endCursor'], 'reviewThreads')
+                for thread in threads:
+                    page = thread['comments']
+                    if page['pageInfo']['hasNextPage']:
+                        page['nodes'] = page['nodes'] + fetch_remaining(run_query, MORE_THREAD_COMMENTS_QUERY, thread['id'],
+                                                                        page['pageInfo']['endCursor'], 'comments')
+                issue['pull_request_url_body'] = to_pull_request_body(issue, node, threads)
@@ -0,0 +1,119 @@
+import os
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+
+class JobRunner:
+    """
+    Durable progress for a long LLM run over one repo. Each finished item is appended as one
+    JSON line, keyed by `key_field` (the PR url), and flushed as soon as it completes, so a
+    crash loses at most the calls in flight. On restart, items whose key is already in the file
+    are skipped. Items whose work raised are not recorded and are retried by the next run.
+    """
+
+    def __init__(self, path, key_field="url"):
+        self.path = path
+        self.key_field = key_field
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._repair()
+        self.done = {record[key_field] for record in self.results()}
+
+    def _repair(self):
+        """Drop a half-written last line left by a crash, so new lines are not appended to it."""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb+") as f:
+            data = f.read()
+            if data and not data.endswith(b"\n"):
+                f.truncate(data.rfind(b"\n") + 1)
+
+    def results(self):
+        """Finished records in completion order."""
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, "r", encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def _append(self, record):
+        with self.lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False))
+                f.write("\n")
+            self.done.add(record[self.key_field])
+
+    def record(self, records):
+        """Append records produced without a worker (e.g. answered locally); returns how many were new."""
+        new = [record for record in records if record[self.key_field] not in self.done]
+        for record in new:
+            self._append(record)
+        return len(new)
+
+    def run(self, items, work, concurrency=8):
+        """
+        Call `work(item)` for every item not finished yet, on `concurrency` threads, appending
+        each returned record (which must carry the item's key) as it completes.
+        Returns (completed, skipped, failed) counts.
+        """
+        pending = [item for item in items if item[self.key_field] not in self.done]
+        skipped = len(items) - len(pending)
+        completed = failed = 0
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures = {executor.submit(work, item): item for item in pending}
+            for future in as_completed(futures):
+                try:
+                    self._append(future.result())
+                    completed += 1
+                except Exception as e:
+                    failed += 1
+                    print(f"{futures[future][self.key_field]} failed, will be retried on the next run: {e}")
+        return completed, skipped, failed
+
+    def run_batches(self, items, work, make_batches, concurrency=8):
+        """
+        Like run(), but `work(batch)` handles several items at once (e.g. one multi-PR prompt) and
+        returns the records it managed to produce; items of a batch without a record count as failed.
+        `make_batches(pending_items)` splits the unfinished items into batches.
+        """
+        pending = [item for item in items if item[self.key_field] not in self.done]
+        skipped = len(items) - len(pending)
+        completed = failed = 0
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures = {executor.submit(work, batch): batch for batch in make_batches(pending)}
+            for future in as_completed(futures):
+                batch = futures[future]
+                try:
+                    records = future.result()
+                except Exception as e:
+                    print(f"Batch of {len(batch)} failed, will be retried on the next run: {e}")
+                    records = []
+                for record in records:
+                    self._append(record)
+                completed += len(records)
+                failed += len(batch) - len(records)
+        return completed, skipped, failed
+
+    def write_json(self, output_file, order=None):
+        """
+        Write the finished records as one JSON array, the format downstream scripts read.
+        `order` is a list of keys to sort by (e.g. the input order); unknown keys go last.
+        """
+        results = self.results()
+        if order is not None:
+            position = {key: i for i, key in enumerate(order)}
+            results.sort(key=lambda record: position.get(record[self.key_field], len(position)))
+        with open(output_file, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=4)
+        return len(results)
+
+
+def run_repos(repos, run_repo, parallel=1):
+    """Run `run_repo(repo)` for every repo, `parallel` repos at a time; one failing repo does not stop the rest."""
+    with ThreadPoolExecutor(max_workers=parallel) as executor:
+        futures = {executor.submit(run_repo, repo): repo for repo in repos}
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                print(f"Error processing {futures[future]}: {e}")
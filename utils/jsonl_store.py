@@ -0,0 +1,80 @@
+import os
+import io
+import gzip
+import json
+
+# Scraped issues are stored as JSON Lines: one issue per line, so files can be appended to
+# and read back one record at a time. ".gz" and ".zst" suffixes select compression.
+RECORD_SUFFIXES = [".jsonl", ".jsonl.gz", ".jsonl.zst", ".json"]
+COMPRESSION_SUFFIXES = {"none": "", "gzip": ".gz", "zstd": ".zst"}
+
+
+def open_text(path, mode="rt"):
+    """Open a possibly compressed file in text mode ('rt', 'wt' or 'at')."""
+    if path.endswith(".gz"):
+        return gzip.open(path, mode, encoding="utf-8")
+    if path.endswith(".zst"):
+        import zstandard  # optional dependency, only needed for .zst files
+
+        if mode == "rt":
+            stream = zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), read_across_frames=True, closefd=True)
+        else:
+            # Appending starts a new zstd frame; readers decode consecutive frames as one stream
+            stream = zstandard.ZstdCompressor().stream_writer(open(path, mode[0] + "b"), closefd=True)
+        return io.TextIOWrapper(stream, encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def append_records(path, records):
+    """Append records to a JSON Lines file, one record per line."""
+    with open_text(path, "at") as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False))
+            f.write("\n")
+
+
+def write_records(path, records):
+    """
+    Write records to a JSON Lines file atomically, so readers never see a half-written file.
+    A legacy .json path gets a JSON array in the same layout scraping.py writes.
+    """
+    # Keep the suffix so the temporary file gets the same compression
+    tmp_path = os.path.join(os.path.dirname(path), f".tmp-{os.path.basename(path)}")
+    try:
+        with open_text(tmp_path, "wt") as f:
+            if path.endswith(".json"):
+                json.dump(list(records), f, indent=2)
+            else:
+                for record in records:
+                    f.write(json.dumps(record, ensure_ascii=False))
+                    f.write("\n")
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def iter_records(path):
+    """
+    Yield the records of a scraped data file one at a time without loading the file.
+    JSON Lines files (optionally .gz/.zst) are streamed line by line; a legacy .json file
+    holding a list yields its items and one holding a single object yields that object.
+    """
+    if path.endswith(".json"):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        yield from data if isinstance(data, list) else [data]
+        return
+
+    with open_text(path, "rt") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def resolve_records_path(path_stem):
+    """Find the scraped data file for `path_stem` in whichever supported format exists."""
+    for suffix in RECORD_SUFFIXES:
+        if os.path.exists(path_stem + suffix):
+            return path_stem + suffix
+    return None
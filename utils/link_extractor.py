@@ -1,38 +1,100 @@
 import re
+import hashlib
 
+# One pass over the text tokenizes every kind of GitHub reference: URLs, closing keywords
+# (close/fix/resolve in any tense, "mentioned in") followed by `#N`, `owner/repo#N`, `GH-N`
+# or a URL (a bare number, as in "fixed 2 typos", is not a reference), and plain `#N` / `GH-N` mentions. Texts of an issue are joined with NUL, which no
+# alternative can match across, so one scan covers them all. The lookahead on the possible
+# first characters lets the scanner skip most positions cheaply.
+TEXT_SEPARATOR = "\x00"
+LINK_PATTERN = re.compile(
+    r'(?=[hfmrcgFMRCG#])(?:'
+    r'(?P<url>https?://[^\s\x00]+)'
+    r'|\b(?P<keyword>(?i:close[sd]?|fix(?:e[sd])?|resolve[sd]?|mentioned in))\b[\s:]*'
+    r'(?:(?P<keyword_url>https?://[^\s\x00]+)|(?:(?P<keyword_repo>[\w.-]+/[\w.-]+)?#|GH-)(?P<keyword_number>\d+)\b)'
+    r'|(?<![&#])#(?P<number>\d+)\b'
+    r'|\bGH-(?P<gh_number>\d+)\b'
+    r')'
+)
+# `owner/repo` right before a plain `#N`, checked only when the `#` follows a name character
+REPO_BEFORE_PATTERN = re.compile(r'(?<![\w.-])[A-Za-z0-9][\w.-]*/[\w.-]+\Z')
+NAME_CHARACTERS = frozenset("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_.-")
+GITHUB_URL_PATTERN = re.compile(
+    r'https?://(?:www\.|redirect\.)?github\.com/(?P<owner>[\w.-]+)/(?P<repo>[\w.-]+)/(?P<kind>pull|issues)/(?P<number>\d+)'
+    r'|https?://api\.github\.com/repos/(?P<api_owner>[\w.-]+)/(?P<api_repo>[\w.-]+)/(?P<api_kind>pulls|issues)/(?P<api_number>\d+)'
+)
+# Bump whenever the patterns or URL typing change, so reextract_links.py recomputes every record
+EXTRACTOR_VERSION = 4
+URL_TYPES = {'pull': 'pull_url', 'pulls': 'pull_url', 'issues': 'issue_url'}
+# Relation of the referencing issue to the target; anything without a keyword is a mention
+RELATIONS = {'mentioned in': 'mentioned_in'}
 
-def extract_links_from_text(string_list):
+
+def parse_github_url(url):
     """
-    Function to extract instances of URLs or issue/PR numbers from a list of strings
+    Parse a github.com or api.github.com issue/PR URL into {'owner', 'repo', 'kind', 'number'},
+    with kind 'pull' or 'issues'. Returns None for any other URL.
     """
-    url_pattern = r'https?://\S+'
-    issue_references_pattern = r'(?:fixes|mentioned in|resolves|closes)[\s#]*(\d+)'
-    
-    urls, issue_references = [], []
-    for string in string_list:
-        urls.extend(re.findall(url_pattern, string))
-        issue_references.extend(re.findall(issue_references_pattern, string, re.IGNORECASE))
-    
-    links_to = []
-    for url in urls:
-        url = url.rstrip('.,!?')  # Remove trailing punctuation
-        type = 'url'
-        if 'pull' in url:
-            type = 'pull_url'
-        elif 'issue' in url:
-            type = 'issue_url'
-        links_to.append({'link':url, 'type':type})
-    
-    for issue_reference in issue_references:
-        links_to.append({'link':f'#{issue_reference}', 'type':'Issue/PR number'})
-
-    return links_to
+    match = GITHUB_URL_PATTERN.match(url)
+    if not match:
+        return None
+    if match.group('owner'):
+        owner, repo, kind, number = match.group('owner', 'repo', 'kind', 'number')
+    else:
+        owner, repo, kind, number = match.group('api_owner', 'api_repo', 'api_kind', 'api_number')
+    return {'owner': owner, 'repo': repo, 'kind': 'pull' if kind == 'pulls' else kind, 'number': int(number)}
 
 
-def extract_all_links(issue, is_pr):
+def url_link(url, relation):
+    url = url.rstrip('.,!?')  # Remove trailing punctuation
+    target = parse_github_url(url)
+    if not target:
+        return {'link': url, 'type': 'url'}
+    return {'link': url, 'type': URL_TYPES[target['kind']], 'repo': f"{target['owner']}/{target['repo']}",
+            'number': target['number'], 'relation': relation}
+
+
+def reference_link(repo, number, relation):
+    """A `#N` reference; `repo` is None for the repo the text belongs to."""
+    return {'link': f'{repo}#{number}' if repo else f'#{number}', 'type': 'Issue/PR number',
+            'repo': repo, 'number': number, 'relation': relation}
+
+
+def extract_links_from_text(string_list):
     """
-    extracts all links in a given issue/PR and returns a dictionary of links anf their types
+    Function to extract instances of URLs or issue/PR numbers from a list of strings.
+    GitHub URLs and references also carry their target ('repo', 'number') and 'relation'
+    ('closes', 'mentioned_in' or 'mentions').
     """
+    text = TEXT_SEPARATOR.join(string_list)
+    urls, issue_references = [], []
+    for match in LINK_PATTERN.finditer(text):
+        url, keyword, number = match.group('url', 'keyword', 'number')
+        if url:
+            urls.append(url_link(url, 'mentions'))
+        elif keyword:
+            relation = RELATIONS.get(keyword.lower(), 'closes')
+            keyword_url = match.group('keyword_url')
+            if keyword_url:
+                urls.append(url_link(keyword_url, relation))
+            else:
+                issue_references.append(reference_link(match.group('keyword_repo'), int(match.group('keyword_number')), relation))
+        elif number:
+            start = match.start()
+            repo = None
+            if start and text[start - 1] in NAME_CHARACTERS:
+                repo_match = REPO_BEFORE_PATTERN.search(text, max(0, start - 200), start)
+                if not repo_match:
+                    continue  # e.g. "issue#12", not a reference GitHub would link
+                repo = repo_match.group()
+            issue_references.append(reference_link(repo, int(number), 'mentions'))
+        else:
+            issue_references.append(reference_link(None, int(match.group('gh_number')), 'mentions'))
+    return urls + issue_references
+
+
+def issue_texts(issue, is_pr):
+    """The body, comments and, for PRs, review comments and commit message of an issue."""
     strings = []
     # add issue body
     if issue.get('body'):
@@ -40,18 +102,41 @@ def extract_all_links(issue, is_pr):
 
     # add comments
     if issue.get('comments_url_body'):
-        comments = [comment.get('body') for comment in issue.get('comments_url_body', []) if comment.get('body')]
-        strings.extend(comments)
-    
+        strings.extend(comment['body'] for comment in issue['comments_url_body'] if comment.get('body'))
+
     # add review comments and commit messages if PR
     if is_pr and issue.get('pull_request_url_body'):
         pr_data = issue['pull_request_url_body']
-        
+
         if pr_data.get('review_comments_url_body'):
-            review_comments = [comment.get('body') for comment in pr_data.get('review_comments_url_body', []) if comment.get('body')]
-            strings.extend(review_comments)
+            strings.extend(comment['body'] for comment in pr_data['review_comments_url_body'] if comment.get('body'))
 
         if pr_data.get('commit_message'):
             strings.append(pr_data['commit_message'])
-    
+    return strings
+
+
+def extract_all_links(issue, is_pr):
+    """
+    extracts all links in a given issue/PR and returns a dictionary of links anf their types
+    """
+    strings = issue_texts(issue, is_pr)
     return extract_links_from_text(strings) if strings else []
+
+
+def links_hash(issue, is_pr):
+    """Hash of the extractor version and the texts links are extracted from."""
+    digest = hashlib.sha256(str(EXTRACTOR_VERSION).encode("utf-8"))
+    for text in issue_texts(issue, is_pr):
+        digest.update(TEXT_SEPARATOR.encode("utf-8"))
+        digest.update(text.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def is_pull_request(issue):
+    return 'pull_request' in issue and 'url' in issue['pull_request']
+
+
+def extract_links_batch(issues):
+    """Extract the links of many scraped issues at once, returning one list of links per issue."""
+    return [extract_all_links(issue, is_pull_request(issue)) for issue in issues]
@@ -0,0 +1,194 @@
+import os
+import argparse
+from collections import deque
+from datetime import datetime
+import numpy as np
+from jsonl_store import iter_records, resolve_records_path
+from link_extractor import parse_github_url
+from repos import repos
+
+# Edge types are the `type` of the link that produced them; plain 'url' links never resolve
+EDGE_TYPES = ('Issue/PR number', 'issue_url', 'pull_url')
+EDGE_TYPE_CODES = {edge_type: code for code, edge_type in enumerate(EDGE_TYPES)}
+
+
+def resolve_link(link, repo):
+    """Issue/PR number a `links_to` entry points at inside `repo`, or None (other repos, plain URLs)."""
+    if 'number' in link:
+        target_repo = link.get('repo')
+        return link['number'] if target_repo is None or target_repo.lower() == repo.lower() else None
+    # Records extracted before links carried their target
+    if link['type'] == 'Issue/PR number':
+        return int(link['link'].lstrip('#'))
+    target = parse_github_url(link['link'])
+    if target and f"{target['owner']}/{target['repo']}".lower() == repo.lower():
+        return target['number']
+    return None
+
+
+def to_timestamp(value):
+    return int(datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()) if value else 0
+
+
+def to_csr(sources, targets, types, num_nodes):
+    """Sort edges by source into (indptr, indices, types) arrays."""
+    order = np.lexsort((targets, sources))
+    indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=num_nodes), out=indptr[1:])
+    return indptr, targets[order].astype(np.int32), types[order]
+
+
+class LinkGraph:
+    """
+    Cross-references between the issues and PRs of one repo, resolved from `links_to`.
+    Forward edges (who does X link to) and backward edges (who links to X) are both kept as
+    CSR arrays, so neighbour lookups are O(degree) and a few MB cover a large repo.
+    Nodes are issue numbers, including linked numbers that were never scraped.
+    """
+
+    ARRAYS = ('numbers', 'scraped', 'is_pr', 'merged', 'created',
+              'fwd_indptr', 'fwd_indices', 'fwd_types', 'bwd_indptr', 'bwd_indices', 'bwd_types')
+
+    def __init__(self, repo, **arrays):
+        self.repo = repo
+        for name in self.ARRAYS:
+            setattr(self, name, arrays[name])
+        self.index = {int(number): i for i, number in enumerate(self.numbers)}
+
+    @classmethod
+    def build(cls, repo, records):
+        """Build the graph from scraped issue records (any iterable, e.g. iter_records)."""
+        nodes = {}
+        sources, targets, types = [], [], []
+        for issue in records:
+            number = issue['number']
+            pull_request = issue.get('pull_request')
+            nodes[number] = (pull_request is not None, bool(pull_request and pull_request.get('merged_at')),
+                             to_timestamp(issue.get('created_at')))
+            for link in issue.get('links_to', []):
+                target = resolve_link(link, repo) if link['type'] in EDGE_TYPE_CODES else None
+                if target is not None and target != number:
+                    sources.append(number)
+                    targets.append(target)
+                    types.append(EDGE_TYPE_CODES[link['type']])
+
+        numbers = np.array(sorted(set(nodes) | set(targets)), dtype=np.int64)
+        edges = np.unique(np.array([sources, targets, types], dtype=np.int64).reshape(3, -1), axis=1)
+        sources = np.searchsorted(numbers, edges[0])
+        targets = np.searchsorted(numbers, edges[1])
+        types = edges[2].astype(np.uint8)
+        attributes = [nodes.get(int(number), (False, False, 0)) for number in numbers]
+
+        fwd_indptr, fwd_indices, fwd_types = to_csr(sources, targets, types, len(numbers))
+        bwd_indptr, bwd_indices, bwd_types = to_csr(targets, sources, types, len(numbers))
+        return cls(
+            repo,
+            numbers=numbers,
+            scraped=np.isin(numbers, list(nodes)),
+            is_pr=np.array([a[0] for a in attributes], dtype=bool),
+            merged=np.array([a[1] for a in attributes], dtype=bool),
+            created=np.array([a[2] for a in attributes], dtype=np.int64),
+            fwd_indptr=fwd_indptr, fwd_indices=fwd_indices, fwd_types=fwd_types,
+            bwd_indptr=bwd_indptr, bwd_indices=bwd_indices, bwd_types=bwd_types,
+        )
+
+    def save(self, path):
+        np.savez_compressed(path, repo=np.array(self.repo), **{name: getattr(self, name) for name in self.ARRAYS})
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(str(data['repo']), **{name: data[name] for name in cls.ARRAYS})
+
+    @property
+    def num_edges(self):
+        return len(self.fwd_indices)
+
+    def neighbors(self, number, direction="forward", types=None):
+        """[(number, type)] linked from (`forward`) or linking to (`backward`) an issue."""
+        i = self.index.get(number)
+        if i is None:
+            return []
+        indptr, indices, edge_types = ((self.fwd_indptr, self.fwd_indices, self.fwd_types) if direction == "forward"
+                                       else (self.bwd_indptr, self.bwd_indices, self.bwd_types))
+        start, end = indptr[i], indptr[i + 1]
+        return [(int(self.numbers[j]), EDGE_TYPES[t]) for j, t in zip(indices[start:end], edge_types[start:end])
+                if types is None or EDGE_TYPES[t] in types]
+
+    def reachable(self, number, direction="forward", max_depth=None, types=None):
+        """Breadth-first transitive closure: {number: depth} of everything reachable from `number`."""
+        directions = ("forward", "backward") if direction == "both" else (direction,)
+        depths = {number: 0}
+        queue = deque([number])
+        while queue:
+            current = queue.popleft()
+            if max_depth is not None and depths[current] >= max_depth:
+                continue
+            for d in directions:
+                for neighbor, _ in self.neighbors(current, d, types):
+                    if neighbor not in depths:
+                        depths[neighbor] = depths[current] + 1
+                        queue.append(neighbor)
+        del depths[number]
+        return depths
+
+    def superseded_by(self, number):
+        """
+        PRs that may have superseded PR `number`: scraped PRs it links to or that link to it,
+        opened no earlier than it, and unscraped (still open) PRs it links to by URL.
+        Merged candidates come first.
+        """
+        i = self.index.get(number)
+        if i is None or not self.is_pr[i]:
+            return []
+        candidates = set()
+        for direction in ("forward", "backward"):
+            for neighbor, edge_type in self.neighbors(number, direction):
+                j = self.index[neighbor]
+                if self.scraped[j]:
+                    if self.is_pr[j] and self.created[j] >= self.created[i]:
+                        candidates.add(neighbor)
+                elif edge_type == 'pull_url':
+                    candidates.add(neighbor)
+        return sorted(candidates, key=lambda n: (not self.merged[self.index[n]], n))
+
+
+def graph_path(repo, data_dir="scraped_data"):
+    return os.path.join(data_dir, f"{repo.replace('/', '_')}_link_graph.npz")
+
+
+def load_graph(repo, data_dir="scraped_data"):
+    """The saved graph of a repo, or None if `link_graph.py` has not been run for it."""
+    path = graph_path(repo, data_dir)
+    return LinkGraph.load(path) if os.path.exists(path) else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the cross-reference link graph of each repo.")
+    parser.add_argument("--data-dir", default="scraped_data", help="directory holding <owner_repo> scraped data")
+    parser.add_argument("--query", type=int, nargs="*", help="print the links of these numbers instead of building")
+    parser.add_argument("--repo", help="repo to query (default: every repo in repos.py)")
+    args = parser.parse_args()
+
+    for repo in [args.repo] if args.repo else repos:
+        if args.query:
+            graph = load_graph(repo, args.data_dir)
+            if graph is None:
+                print(f"No link graph for {repo}. Build it first.")
+                continue
+            for number in args.query:
+                print(f"{repo}#{number}: links to {graph.neighbors(number)}, linked from {graph.neighbors(number, 'backward')}, "
+                      f"superseded by {graph.superseded_by(number)}")
+            continue
+
+        input_file = resolve_records_path(os.path.join(args.data_dir, repo.replace("/", "_")))
+        if not input_file:
+            print(f"No scraped data found for {repo} in {args.data_dir}/. Skipping...")
+            continue
+        graph = LinkGraph.build(repo, iter_records(input_file))
+        graph.save(graph_path(repo, args.data_dir))
+        print(f"{repo}: {len(graph.numbers)} nodes, {graph.num_edges} edges saved to {graph_path(repo, args.data_dir)}")
+
+
+if __name__ == "__main__":
+    main()
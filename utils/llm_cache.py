@@ -0,0 +1,65 @@
+import os
+import json
+import time
+import zlib
+import hashlib
+from sqlite_lru import SQLiteLRU
+
+DEFAULT_PATH = "llm_cache.sqlite"
+DEFAULT_MAX_BYTES = 512 * 1024 ** 2  # 512 MiB of compressed responses
+
+
+class ReplayMiss(LookupError):
+    """A prompt that is not in the cache while running in replay mode."""
+
+
+def prompt_key(model_name, prompt, params=None):
+    """Content address of an LLM call: hash of the model, generation parameters and prompt text."""
+    digest = hashlib.sha256(f"{model_name}\n{json.dumps(params, sort_keys=True, default=str)}\n".encode("utf-8"))
+    digest.update(prompt.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class LLMCache(SQLiteLRU):
+    """
+    On-disk cache of LLM responses in SQLite, keyed by (model, prompt hash, generation params),
+    with zlib-compressed response texts. Entries are evicted least recently used first once the
+    compressed size exceeds `max_bytes`. In replay mode the cache is read-only and a miss
+    raises ReplayMiss instead of letting the call reach the API.
+    """
+
+    label = "LLM cache"
+
+    def __init__(self, path=DEFAULT_PATH, max_bytes=DEFAULT_MAX_BYTES, replay=False):
+        self.replay = replay
+        super().__init__(path, "llm_responses", "model TEXT, response BLOB, size INTEGER, created_at REAL, accessed_at REAL",
+                         max_bytes)
+
+    def get(self, model_name, prompt, params=None):
+        """The cached response text, or None on a miss (ReplayMiss in replay mode)."""
+        key = prompt_key(model_name, prompt, params)
+        row = self.lookup(key, "response", touch=not self.replay)
+        if row is None:
+            if self.replay:
+                raise ReplayMiss(f"prompt {key[:12]} for {model_name} is not cached")
+            return None
+        return zlib.decompress(row[0]).decode("utf-8")
+
+    def put(self, model_name, prompt, params, response):
+        if self.replay:
+            return
+        blob = zlib.compress(response.encode("utf-8"))
+        self.store(prompt_key(model_name, prompt, params),
+                   {'model': model_name, 'response': blob, 'created_at': time.time()}, len(blob))
+
+
+def create_cache():
+    """
+    The cache configured by the environment: LLM_CACHE (path, "none" disables it),
+    LLM_CACHE_MAX_MB and LLM_REPLAY=1 for read-only replay.
+    """
+    path = os.getenv("LLM_CACHE", DEFAULT_PATH)
+    if path.lower() == "none":
+        return None
+    max_bytes = int(float(os.getenv("LLM_CACHE_MAX_MB", DEFAULT_MAX_BYTES / 1024 ** 2)) * 1024 ** 2)
+    return LLMCache(path, max_bytes, replay=bool(os.getenv("LLM_REPLAY")))
@@ -0,0 +1,195 @@
+import os
+import time
+import random
+import threading
+from llm_cache import ReplayMiss, create_cache
+
+DEFAULT_MODEL = "gemini-1.5-pro-latest"
+DEFAULT_CONCURRENCY = 8
+DEFAULT_RPM = 60  # requests per minute
+DEFAULT_TPM = 1_000_000  # prompt + response tokens per minute
+RETRYABLE_CODES = (429, 500, 503, 504)
+RETRYABLE_ERRORS = ("ResourceExhausted", "TooManyRequests", "ServiceUnavailable", "InternalServerError", "DeadlineExceeded")
+EMPTY_RESPONSE = "No response"
+
+
+def create_model(name=DEFAULT_MODEL):
+    """
+    The Gemini model used by the analysis scripts. With LLM_FAKE=1 in the environment, a local
+    fake_llm.FakeModel is returned instead, so pipelines run without an API key or quota.
+    """
+    if os.getenv("LLM_FAKE"):
+        from fake_llm import FakeModel
+
+        return FakeModel(f"fake:{name}")  # its canned answers are cached apart from the real model's
+
+    import google.generativeai as genai  # only needed when talking to the real API
+
+    genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+    return genai.GenerativeModel(name)
+
+
+def estimate_tokens(text):
+    """Rough token count (about 4 characters per token), used before the API reports usage."""
+    return len(text) // 4 + 1
+
+
+def is_retryable(error):
+    """Rate limits (429) and transient server errors are retried; anything else fails the prompt."""
+    code = getattr(error, "code", None)
+    return code in RETRYABLE_CODES or type(error).__name__ in RETRYABLE_ERRORS
+
+
+class TokenBucket:
+    """Refills continuously at `per_minute` units per minute, holding at most one minute's worth."""
+
+    def __init__(self, per_minute, clock=time.monotonic):
+        self.capacity = per_minute
+        self.rate = per_minute / 60
+        self.level = per_minute
+        self.clock = clock
+        self.updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount):
+        """Seconds until `amount` units are available (0 if they are now)."""
+        self._refill()
+        amount = min(amount, self.capacity)  # a single huge prompt waits for a full bucket, not forever
+        return 0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount):
+        self.level -= amount
+
+
+class LLMClient:
+    """
+    Sends prompts to a model from many threads at once (`concurrency` is the thread count the
+    job_runner pools use). A request bucket (RPM) and a token bucket (TPM) pace the calls, and
+    retryable errors are retried with exponential backoff and full jitter before `generate`
+    raises. With an llm_cache.LLMCache, byte-identical prompts are answered from disk.
+    `clock` and `sleep` can be replaced with a fake clock in tests.
+    """
+
+    def __init__(self, model, concurrency=DEFAULT_CONCURRENCY, rpm=DEFAULT_RPM, tpm=DEFAULT_TPM, max_retries=6,
+                 base_delay=1.0, max_delay=60.0, generation_config=None, cache=None, clock=time.monotonic, sleep=time.sleep):
+        self.model = model
+        self.model_name = getattr(model, "model_name", type(model).__name__)
+        self.cache = cache
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.generation_config = generation_config
+        self.clock = clock
+        self.sleep = sleep
+        self.lock = threading.Lock()
+        self.requests = TokenBucket(rpm, clock)
+        self.tokens = TokenBucket(tpm, clock)
+        self.counts = {'requests': 0, 'retries': 0, 'tokens': 0}
+        self.throttled_seconds = 0.0
+
+    def _acquire(self, prompt_tokens):
+        """Block until both buckets have room for one request of `prompt_tokens` tokens."""
+        while True:
+            with self.lock:
+                wait = max(self.requests.wait_time(1), self.tokens.wait_time(prompt_tokens))
+                if wait == 0:
+                    self.requests.take(1)
+                    self.tokens.take(prompt_tokens)
+                    return
+                self.throttled_seconds += wait
+            self.sleep(wait)
+
+    def _record_usage(self, response, prompt_tokens):
+        """Charge the token bucket for what the call really used, once the API reports it."""
+        usage = getattr(response, "usage_metadata", None)
+        used = getattr(usage, "total_token_count", None) or prompt_tokens
+        with self.lock:
+            self.tokens.take(used - prompt_tokens)
+            self.counts['requests'] += 1
+            self.counts['tokens'] += used
+
+    def generate(self, prompt, refresh=False):
+        """
+        Response text for one prompt, retrying rate limits and transient errors. Raises on failure.
+        `refresh` skips the cached answer, e.g. when a caller retries a response it could not parse.
+        """
+        if self.cache is not None and not refresh:
+            cached = self.cache.get(self.model_name, prompt, self.generation_config)
+            if cached is not None:
+                return cached
+        if self.cache is not None and self.cache.replay:
+            raise ReplayMiss("replay mode never calls the API")
+
+        prompt_tokens = estimate_tokens(prompt)
+        for attempt in range(self.max_retries + 1):
+            self._acquire(prompt_tokens)
+            try:
+                if self.generation_config is None:
+                    response = self.model.generate_content(prompt)
+                else:
+                    response = self.model.generate_content(prompt, generation_config=self.generation_config)
+            except Exception as e:
+                if not is_retryable(e) or attempt == self.max_retries:
+                    raise
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+                with self.lock:
+                    self.counts['retries'] += 1
+                print(f"LLM call failed ({type(e).__name__}), retrying in {delay:.1f}s ({attempt + 1}/{self.max_retries})")
+                self.sleep(delay)
+                continue
+
+            self._record_usage(response, prompt_tokens)
+            try:
+                text = response.text
+            except ValueError:  # blocked by safety filters, no candidates
+                text = None
+            if not text:
+                return EMPTY_RESPONSE
+            text = text.strip()
+            if self.cache is not None:
+                self.cache.put(self.model_name, prompt, self.generation_config, text)
+            return text
+
+    def generate_number(self, prompt, valid, retries=3):
+        """
+        The first answer to `prompt` that is a number in `valid`, asking again past the cache up to
+        `retries` times, or None. In replay mode an uncached prompt gives None without an API call.
+        """
+        for attempt in range(retries):
+            try:
+                number = int(self.generate(prompt, refresh=attempt > 0))
+                if number in valid:
+                    return number
+            except (ValueError, TypeError):
+                print(f"Invalid response from API. Retrying... ({attempt + 1}/{retries})")
+            except ReplayMiss:
+                break
+        return None
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counts, throttled_seconds=round(self.throttled_seconds, 1))
+        if self.cache is not None:
+            stats['cache'] = self.cache.stats()
+        return stats
+
+
+def create_client(model_name=DEFAULT_MODEL, generation_config=None):
+    """
+    The Gemini client of every analysis script, configured by the environment: LLM_CONCURRENCY,
+    LLM_RPM and LLM_TPM for pacing, LLM_CACHE / LLM_CACHE_MAX_MB for the shared response cache
+    and LLM_REPLAY=1 for cache-only runs (see llm_cache.create_cache). Call it after load_dotenv().
+    """
+    return LLMClient(
+        create_model(model_name),
+        concurrency=int(os.getenv("LLM_CONCURRENCY", DEFAULT_CONCURRENCY)),
+        rpm=int(os.getenv("LLM_RPM", DEFAULT_RPM)),
+        tpm=int(os.getenv("LLM_TPM", DEFAULT_TPM)),
+        generation_config=generation_config,
+        cache=create_cache(),
+    )
@@ -0,0 +1,265 @@
+import os
+import re
+import json
+import glob
+import time
+import pickle
+import hashlib
+import argparse
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.multiclass import OneVsRestClassifier
+from sklearn.preprocessing import MultiLabelBinarizer
+from calculate_jaccard_coefficient import jaccard_similarity
+from fewshot import ANALYSIS_DIR, LLM_OUTPUT_DIR, summaries_by_url
+from pr_summary import BASE_DIR
+
+# Local fast path of the 15-reason classifier: PRs that rules or a TF-IDF + logistic regression
+# model can classify confidently are answered on the CPU, only the rest go to the LLM.
+#   python utils/local_classifier.py --threshold 0.9     # cross-validated coverage and agreement
+#   python utils/classify_PR_among_15_reasons.py --local
+MODEL_PATH = os.path.join(BASE_DIR, "ai_generated_15_reasons", "local_classifier.pkl")
+DEFAULT_THRESHOLD = 0.9
+MIN_TRAINING_PRS = 50  # below this only the rules are used
+FOLDS = 5
+
+SUPERSEDED_REASON = 1
+INACTIVE_REASON = 3
+REDUNDANT_REASON = 4
+# GitHub's lock reasons; the summary says "PR was locked because of <reason>." Only those a
+# maintainer picks for the PR itself are ruled: lock-threads bots mark every old closed PR
+# "resolved", and "off-topic" says nothing about why the PR was closed.
+LOCK_REASONS = {"spam": [13], "too heated": [14]}
+LOCKED_PATTERN = re.compile(r"PR was locked because of ([\w -]+)\.")
+BOT_CLOSER_PATTERN = re.compile(r"and was closed at \S+ by a Bot\.")
+STALE_PATTERN = re.compile(r"\b(stale|inactiv\w*|no recent activity)\b", re.IGNORECASE)
+PR_REFERENCE = r"(?:#|https://github\.com/[\w.-]+/[\w.-]+/pull/)(\d+)"
+# "in favor of #N" and "duplicate of #N" also appear in ordinary discussion ("I'm in favor of #123
+# landing first"), so they count only right after closing wording in the same sentence
+CLOSING = r"\bclos(?:e|es|ed|ing)\b[^.\n']{0,40}?"
+SUPERSEDED_PATTERN = re.compile(
+    rf"(?:\b(?:superseded by|replaced by|obsoleted by)|{CLOSING}\bin favou?r of)\s+{PR_REFERENCE}", re.IGNORECASE)
+DUPLICATE_PATTERN = re.compile(rf"{CLOSING}\bduplicate of\s+{PR_REFERENCE}", re.IGNORECASE)
+SUPERSEDED_WORDING = re.compile(r"\bsupersed\w*\b", re.IGNORECASE)
+
+
+def rule_reasons(item, graph=None):
+    """(reasons, rule name) for PRs whose closing reason is stated outright, or None."""
+    summary = item["summary"]
+    locked = LOCKED_PATTERN.search(summary)
+    if locked and locked.group(1) in LOCK_REASONS:
+        return LOCK_REASONS[locked.group(1)], f"locked as {locked.group(1)}"
+    if SUPERSEDED_PATTERN.search(summary):
+        return [SUPERSEDED_REASON], "superseded by a referenced PR"
+    if DUPLICATE_PATTERN.search(summary):
+        return [REDUNDANT_REASON], "closed as a duplicate"
+    # "Superseded" without a PR number counts when the link graph shows a superseding PR
+    if graph is not None and SUPERSEDED_WORDING.search(summary) and graph.superseded_by(item["number"]):
+        return [SUPERSEDED_REASON], "superseded per link graph"
+    # Bots also close PRs that landed through an internal mirror, so only stale-bot closes are ruled
+    if BOT_CLOSER_PATTERN.search(summary) and STALE_PATTERN.search(summary):
+        return [INACTIVE_REASON], "closed by a stale bot"
+    return None
+
+
+def load_training_data(analysis_dir=ANALYSIS_DIR, llm_output_dir=LLM_OUTPUT_DIR):
+    """
+    Labelled PRs as dicts of url, summary, reasons and llm_reasons. `reasons` is the union of
+    both annotators' labels where a PR was annotated, otherwise the earlier LLM answer; answers
+    of this fast path itself (records with `classified_by`) are not trained on. Analysis files
+    have no summaries, they are looked up by url (fewshot.summaries_by_url).
+    """
+    examples = {}
+    for directory, annotated in ((analysis_dir, True), (llm_output_dir, False)):
+        for path in sorted(glob.glob(os.path.join(directory, "*.json"))):
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if not isinstance(data, list):
+                continue
+            summaries = summaries_by_url(os.path.basename(path), llm_output_dir) if annotated else {}
+            missing = 0
+            for entry in data:
+                url = entry.get("url")
+                if not url or url in examples or "classified_by" in entry:
+                    continue
+                human = sorted(set(entry.get("human_reason_1", [])) | set(entry.get("human_reason_2", []))) if annotated else []
+                llm_reasons = entry.get("predicted_reason") if isinstance(entry.get("predicted_reason"), list) else None
+                summary = entry.get("summary") or summaries.get(url)
+                if not summary:
+                    missing += bool(human)
+                elif human or llm_reasons:
+                    examples[url] = {"url": url, "summary": summary, "reasons": human or llm_reasons,
+                                     "llm_reasons": llm_reasons, "annotated": bool(human)}
+            if missing:
+                print(f"Warning: {missing} annotated PRs of {path} have no summary, they are not trained on")
+    return list(examples.values())
+
+
+def training_key(examples):
+    return hashlib.sha1(json.dumps([[e["url"], e["reasons"], e["summary"]] for e in examples]).encode("utf-8")).hexdigest()
+
+
+class LocalClassifier:
+    """
+    TF-IDF over the PR summary and one logistic regression per reason. A PR gets the reasons
+    whose probability is at least 0.5; its confidence is the least certain of the 15 yes/no
+    decisions, min(max(p, 1 - p)), and it is answered locally only at `threshold` or above.
+    """
+
+    def __init__(self, vectorizer, model, binarizer, threshold=DEFAULT_THRESHOLD):
+        self.vectorizer = vectorizer
+        self.model = model
+        self.binarizer = binarizer
+        self.threshold = threshold
+
+    @classmethod
+    def train(cls, examples, threshold=DEFAULT_THRESHOLD):
+        vectorizer = TfidfVectorizer(ngram_range=(1, 2), sublinear_tf=True, max_features=100000)
+        binarizer = MultiLabelBinarizer()
+        labels = binarizer.fit_transform([e["reasons"] for e in examples])
+        model = OneVsRestClassifier(LogisticRegression(max_iter=1000))
+        model.fit(vectorizer.fit_transform([e["summary"] for e in examples]), labels)
+        return cls(vectorizer, model, binarizer, threshold)
+
+    def predict(self, summaries):
+        """(reasons, confidence) per summary, in one vectorized pass."""
+        probabilities = self.model.predict_proba(self.vectorizer.transform(summaries))
+        confidences = np.maximum(probabilities, 1 - probabilities).min(axis=1)
+        classes = self.binarizer.classes_
+        return [([int(c) for c in classes[row >= 0.5]], float(confidence)) for row, confidence in zip(probabilities, confidences)]
+
+    def classify(self, items, graph=None):
+        """{url: (reasons, classified_by)} for the items answered by a rule or a confident prediction."""
+        decided = {}
+        undecided = []
+        for item in items:
+            ruled = rule_reasons(item, graph)
+            if ruled:
+                decided[item["url"]] = (ruled[0], f"rule: {ruled[1]}")
+            else:
+                undecided.append(item)
+        if self.model is not None and undecided:
+            for item, (reasons, confidence) in zip(undecided, self.predict([item["summary"] for item in undecided])):
+                if reasons and confidence >= self.threshold:
+                    decided[item["url"]] = (reasons, f"model: {confidence:.3f}")
+        return decided
+
+
+def fold_of(url, folds):
+    return int(hashlib.sha1(url.encode("utf-8")).hexdigest()[:8], 16) % folds
+
+
+class OutOfFoldClassifier:
+    """
+    One LocalClassifier per fold of the labelled PRs (split by url hash), each trained on the
+    other folds. A PR is predicted by the model of its own fold, so a labelled PR is never
+    answered by a model that saw its label, human or LLM; otherwise its annotation would leak
+    into the human-vs-AI comparison of the classified output.
+    """
+
+    def __init__(self, classifiers, threshold=DEFAULT_THRESHOLD):
+        self.classifiers = classifiers
+        self.threshold = threshold
+
+    @classmethod
+    def train(cls, examples, threshold=DEFAULT_THRESHOLD, folds=FOLDS):
+        return cls([LocalClassifier.train([e for e in examples if fold_of(e["url"], folds) != fold], threshold)
+                    for fold in range(folds)], threshold)
+
+    def classify(self, items, graph=None):
+        """{url: (reasons, classified_by)}, as LocalClassifier.classify, each item by its fold's model."""
+        by_fold = {}
+        for item in items:
+            by_fold.setdefault(fold_of(item["url"], len(self.classifiers)), []).append(item)
+        decided = {}
+        for fold, fold_items in by_fold.items():
+            classifier = self.classifiers[fold]
+            classifier.threshold = self.threshold
+            decided.update(classifier.classify(fold_items, graph))
+        return decided
+
+
+def load_classifier(threshold=None):
+    """
+    The out-of-fold local classifier, retrained only when the labelled data changed (kept in
+    MODEL_PATH). With fewer than MIN_TRAINING_PRS labelled PRs it applies the rules only.
+    """
+    threshold = DEFAULT_THRESHOLD if threshold is None else threshold
+    examples = load_training_data()
+    if len(examples) < MIN_TRAINING_PRS:
+        print(f"Local classifier: {len(examples)} labelled PRs, using rules only")
+        return LocalClassifier(None, None, None, threshold)
+    key = f"{FOLDS}:{training_key(examples)}"
+    if os.path.exists(MODEL_PATH):
+        with open(MODEL_PATH, "rb") as f:
+            state = pickle.load(f)
+        if state["key"] == key:
+            classifier = state["classifier"]
+            classifier.threshold = threshold
+            return classifier
+    start = time.perf_counter()
+    classifier = OutOfFoldClassifier.train(examples, threshold)
+    with open(MODEL_PATH, "wb") as f:
+        pickle.dump({"key": key, "classifier": classifier}, f)
+    print(f"Local classifier trained on {len(examples)} labelled PRs ({FOLDS} out-of-fold models) "
+          f"in {time.perf_counter() - start:.1f}s")
+    return classifier
+
+
+def evaluate(examples, threshold=DEFAULT_THRESHOLD, folds=5, seed=42):
+    """
+    Cross-validated coverage and agreement: each fold is classified by a model trained on the
+    others, and the PRs it answers locally are compared (Jaccard) with the LLM's and the
+    annotators' labels.
+    """
+    order = np.random.default_rng(seed).permutation(len(examples))
+    local = ruled = 0
+    vs_llm, vs_human = [], []
+    seconds = 0.0
+    for fold in range(folds):
+        test = [examples[i] for i in order[fold::folds]]
+        train = [examples[i] for j, i in enumerate(order) if j % folds != fold]
+        classifier = LocalClassifier.train(train, threshold)
+        start = time.perf_counter()
+        decided = classifier.classify(test)
+        seconds += time.perf_counter() - start
+        for example in test:
+            if example["url"] not in decided:
+                continue
+            reasons, classified_by = decided[example["url"]]
+            local += 1
+            ruled += classified_by.startswith("rule")
+            if example["llm_reasons"]:
+                vs_llm.append(jaccard_similarity(set(reasons), set(example["llm_reasons"])))
+            if example["annotated"]:
+                vs_human.append(jaccard_similarity(set(reasons), set(example["reasons"])))
+    return {
+        "prs": len(examples),
+        "answered_locally": local,
+        "by_rules": ruled,
+        "llm_call_reduction": local / len(examples),
+        "local_prs_per_second": len(examples) / seconds if seconds else None,
+        "average_local_vs_llm": sum(vs_llm) / len(vs_llm) if vs_llm else None,
+        "average_local_vs_human": sum(vs_human) / len(vs_human) if vs_human else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train and cross-validate the local fast path of the 15-reason classifier.")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="confidence needed to skip the LLM")
+    parser.add_argument("--folds", type=int, default=5)
+    args = parser.parse_args()
+
+    examples = load_training_data()
+    print(f"{len(examples)} labelled PRs ({sum(e['annotated'] for e in examples)} annotated, "
+          f"{sum(e['llm_reasons'] is not None for e in examples)} with an LLM answer)")
+    if len(examples) < max(MIN_TRAINING_PRS, args.folds):
+        print("Not enough labelled PRs to train; run classify_PR_among_15_reasons.py first.")
+        return
+    print(json.dumps(evaluate(examples, args.threshold, args.folds), indent=4))
+    load_classifier(args.threshold)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,44 +1,112 @@
 import os
+import re
 import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from jsonl_store import COMPRESSION_SUFFIXES, RECORD_SUFFIXES, iter_records, open_text
 from repos import repos  # Import repo list from the original script
 
-def merge_json_files(repo):
-    """Merge all JSON pages for a given repository."""
+SCRAPED_DIR = "scraped_issues"
+PAGE_FILE_PATTERN = re.compile(r"_(?:update_(?P<run>[^_]+)_)?page_(?P<page>\d+)\.")
+
+def page_order(file_name):
+    """Full-crawl pages first, then incremental update runs oldest first, each by page number."""
+    match = PAGE_FILE_PATTERN.search(file_name)
+    return (match.group("run") or "", int(match.group("page")))
+
+def list_page_files(input_dir):
+    """Page files written by scraping.py, in any supported format, in crawl order."""
+    page_files = [
+        file_name for file_name in os.listdir(input_dir)
+        if "merged" not in file_name and not file_name.startswith(".")
+        and any(file_name.endswith(suffix) for suffix in RECORD_SUFFIXES)
+        and PAGE_FILE_PATTERN.search(file_name)
+    ]
+    return sorted(page_files, key=page_order)
+
+def iter_page_records(input_dir):
+    """Stream (position, issue) for every page file, one record at a time."""
+    position = 0
+    for file_name in list_page_files(input_dir):
+        file_path = os.path.join(input_dir, file_name)
+        try:
+            for issue in iter_records(file_path):
+                yield position, issue
+                position += 1
+        except Exception as e:
+            print(f"Error reading {file_name}: {e}")
+
+def latest_positions(input_dir):
+    """
+    First pass of a deduplicating merge: map each issue id to the position of its last
+    occurrence, so an issue re-fetched by a later update run replaces the earlier copy.
+    Only ids and positions are kept in memory, never the records.
+    """
+    latest = {}
+    for position, issue in iter_page_records(input_dir):
+        if issue.get('id') is not None:
+            latest[issue['id']] = position
+    return latest
+
+def merge_json_files(repo, output_suffix=".json", dedupe=True, scraped_dir=SCRAPED_DIR):
+    """
+    Merge all pages for a given repository by streaming records straight to the output,
+    either as one JSON array (".json") or as JSON Lines (".jsonl" plus compression suffix).
+    With `dedupe`, only the latest copy of each issue id is written.
+    """
     repo_path = repo.replace("/", "_")
-    input_dir = os.path.join("scraped_issues", repo_path)
-    output_file = os.path.join(input_dir, f"{repo_path}_merged.json")
-    
+    input_dir = os.path.join(scraped_dir, repo_path)
+    output_file = os.path.join(input_dir, f"{repo_path}_merged{output_suffix}")
+
     if not os.path.exists(input_dir):
         print(f"No data found for {repo}. Skipping...")
         return
-    
-    all_issues = []
-    
-    for file_name in sorted(os.listdir(input_dir)):
-        if file_name.endswith(".json") and "merged" not in file_name:
-            file_path = os.path.join(input_dir, file_name)
-            try:
-                with open(file_path, "r") as f:
-                    data = json.load(f)
-                    if isinstance(data, list):
-                        all_issues.extend(data)
-            except Exception as e:
-                print(f"Error reading {file_name}: {e}")
-    
+
+    latest = latest_positions(input_dir) if dedupe else None
+    count = 0
+    skipped = 0
     try:
-        with open(output_file, "w") as f:
-            json.dump(all_issues, f, indent=2)
-        print(f"Merged data saved to {output_file}")
+        with open_text(output_file, "wt") as f:
+            if output_suffix == ".json":
+                f.write("[\n")
+            for position, issue in iter_page_records(input_dir):
+                if latest is not None and latest.get(issue.get('id'), position) != position:
+                    skipped += 1
+                    continue
+                if output_suffix == ".json":
+                    f.write(",\n" if count else "")
+                    f.write(json.dumps(issue, indent=2))
+                else:
+                    f.write(json.dumps(issue, ensure_ascii=False))
+                    f.write("\n")
+                count += 1
+            if output_suffix == ".json":
+                f.write("\n]\n")
+        print(f"Merged {count} issues ({skipped} superseded duplicates dropped) saved to {output_file}")
     except Exception as e:
         print(f"Error saving merged data for {repo}: {e}")
 
 def main():
     """Main function to merge JSON files for all repositories."""
-    
-    for repo in repos:
-        print(f"Merging pages for {repo}...")
-        merge_json_files(repo)
-    
+    parser = argparse.ArgumentParser(description="Merge scraped pages into one file per repository.")
+    parser.add_argument("--format", choices=["json", "jsonl"], default="json",
+                        help="write the merged file as a JSON array or as JSON Lines")
+    parser.add_argument("--compress", choices=list(COMPRESSION_SUFFIXES), default="none",
+                        help="compression for --format jsonl output")
+    parser.add_argument("--dedupe", action=argparse.BooleanOptionalAction, default=True,
+                        help="keep only the latest copy of each issue id (default: on)")
+    parser.add_argument("--processes", type=int, default=1, help="number of repos merged in parallel")
+    args = parser.parse_args()
+    output_suffix = ".json" if args.format == "json" else ".jsonl" + COMPRESSION_SUFFIXES[args.compress]
+
+    with ProcessPoolExecutor(max_workers=args.processes) as executor:
+        futures = []
+        for repo in repos:
+            print(f"Merging pages for {repo}...")
+            futures.append(executor.submit(merge_json_files, repo, output_suffix, args.dedupe))
+        for future in futures:
+            future.result()
+
     print("Merging completed.")
 
 if __name__ == "__main__":
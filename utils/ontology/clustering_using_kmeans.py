@@ -1,56 +1,118 @@
 import os
+import sys
 import json
-import numpy as np
+import time
+import pickle
 import random
-from sklearn.cluster import KMeans
-from sentence_transformers import SentenceTransformer
-from utils.generate_reasons import json_to_paragraph, load_json
+import argparse
+import numpy as np
+from sklearn.cluster import MiniBatchKMeans
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))  # the scripts in utils/
+from embedding_pipeline import DEFAULT_BATCH_SIZE, embed_texts
+from embedding_store import DEFAULT_DIR, EmbeddingStore
+from jsonl_store import iter_records
+from pr_summary import json_to_summary
 
 # Load dataset
-input_file = os.path.join(os.path.dirname(__file__), "../scraped_data/unmerged_prs_jax-ml_jax.json")
+input_file = os.path.join(os.path.dirname(__file__), "../../scraped_data/unmerged_prs_jax-ml_jax.json")
 output_file = os.path.join(os.path.dirname(__file__), "clustered_issues.json")
+selected_output_file = os.path.join(os.path.dirname(__file__), "selected_issues.json")
 
-if not os.path.exists(input_file):
-    print(f"Error: File '{input_file}' not found.")
+MODEL_NAME = 'all-MiniLM-L6-v2'
+NUM_CLUSTERS = 30  # Adjust based on data size
 
-data = load_json(input_file)
 
-# Convert all JSON entries to paragraphs
-paragraphs = [json_to_paragraph(entry) for entry in data]
+def kmeans_state_path(num_clusters):
+    return os.path.join(DEFAULT_DIR, f"{MODEL_NAME}.kmeans_{num_clusters}.pkl")
 
-# Generate embeddings using BERT
-model = SentenceTransformer('all-MiniLM-L6-v2')
-embeddings = model.encode(paragraphs)
 
-# Apply K-Means Clustering
-num_clusters = 30  # Adjust based on data size
-kmeans = KMeans(n_clusters=num_clusters, random_state=42)
-kmeans.fit(embeddings)
-labels = kmeans.labels_
+def update_clusters(vectors, rows, num_clusters, recluster=False):
+    """
+    Cluster labels of `vectors` (whose embedding store rows are `rows`). The MiniBatchKMeans
+    model is kept between runs and only updated with partial_fit on rows it has not seen,
+    so new PRs from a nightly scrape move the centroids without a full re-fit.
+    `recluster` fits from scratch on all vectors.
+    """
+    state_path = kmeans_state_path(num_clusters)
+    state = None
+    if os.path.exists(state_path) and not recluster:
+        with open(state_path, "rb") as f:
+            state = pickle.load(f)
 
-# Organize clustered issues
-clustered_issues = {i: [] for i in range(num_clusters)}
-for i, label in enumerate(labels):
-    clustered_issues[label].append(paragraphs[i])
+    if state is None:
+        kmeans = MiniBatchKMeans(n_clusters=num_clusters, random_state=42, batch_size=1024, n_init=3)
+        kmeans.fit(vectors)
+        fitted = np.unique(rows)
+        print(f"Fitted {num_clusters} clusters on {len(vectors)} paragraphs")
+    else:
+        kmeans, fitted = state["kmeans"], state["fitted_rows"]
+        new = ~np.isin(rows, fitted)
+        if new.any():
+            kmeans.partial_fit(vectors[new])
+            fitted = np.union1d(fitted, rows[new])
+        print(f"Updated {num_clusters} clusters with {int(new.sum())} new paragraphs")
 
-# Save clustered issues to a JSON file
-with open(output_file, "w", encoding="utf-8") as f:
-    json.dump(clustered_issues, f, indent=4)
+    with open(state_path, "wb") as f:
+        pickle.dump({"kmeans": kmeans, "fitted_rows": fitted}, f)
+    return kmeans.predict(vectors)
 
-print(f"Clustered issues saved to {output_file}")
 
-# Randomly select one issue per cluster
-random.seed(42)  # Ensure reproducibility
-selected_issues = {cluster: random.choice(issues) for cluster, issues in clustered_issues.items() if issues}
+def main():
+    parser = argparse.ArgumentParser(description="Cluster unmerged PRs by the embeddings of their summaries.")
+    parser.add_argument("--input", default=input_file)
+    parser.add_argument("--clusters", type=int, default=NUM_CLUSTERS)
+    parser.add_argument("--recluster", action="store_true", help="fit the clusters from scratch instead of updating them")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="paragraphs per encoder batch")
+    parser.add_argument("--processes", type=int, default=1, help="encoder processes (see embedding_pipeline.py)")
+    args = parser.parse_args()
 
-# Save selected issues to a separate file
-selected_output_file = os.path.join(os.path.dirname(__file__), "selected_issues.json")
-with open(selected_output_file, "w", encoding="utf-8") as f:
-    json.dump(selected_issues, f, indent=4)
+    if not os.path.exists(args.input):
+        print(f"Error: File '{args.input}' not found.")
+        return
+
+    # Convert all JSON entries to paragraphs
+    paragraphs = [json_to_summary(entry)[0] for entry in iter_records(args.input)]
+
+    # Embeddings are cached per paragraph, so only new or changed PRs are encoded
+    store = EmbeddingStore(MODEL_NAME)
+    encoded, seconds = embed_texts(store, paragraphs, args.batch_size, args.processes)
+    rate = f", {encoded / seconds:.1f} paragraphs/s" if encoded else ""
+    print(f"Encoded {encoded} new paragraphs, {len(paragraphs) - encoded} from the embedding store{rate}")
+    rows = store.lookup(paragraphs)
+    embeddings = np.asarray(store.vectors()[rows])
+
+    # Apply K-Means Clustering
+    start = time.perf_counter()
+    labels = update_clusters(embeddings, rows, args.clusters, args.recluster)
+    print(f"Clustering took {time.perf_counter() - start:.1f}s")
+
+    # Organize clustered issues
+    clustered_issues = {i: [] for i in range(args.clusters)}
+    for i, label in enumerate(labels):
+        clustered_issues[int(label)].append(paragraphs[i])
+
+    # Save clustered issues to a JSON file
+    with open(output_file, "w", encoding="utf-8") as f:
+        json.dump(clustered_issues, f, indent=4)
+
+    print(f"Clustered issues saved to {output_file}")
+
+    # Randomly select one issue per cluster
+    random.seed(42)  # Ensure reproducibility
+    selected_issues = {cluster: random.choice(issues) for cluster, issues in clustered_issues.items() if issues}
+
+    # Save selected issues to a separate file
+    with open(selected_output_file, "w", encoding="utf-8") as f:
+        json.dump(selected_issues, f, indent=4)
+
+    print(f"Randomly selected issues saved to {selected_output_file}")
+
+    # Print selected issues for verification
+    for cluster, issue in selected_issues.items():
+        print(f"\nCluster {cluster} (Selected Issue):")
+        print(issue[:300], "...")  # Truncate for readability
 
-print(f"Randomly selected issues saved to {selected_output_file}")
 
-# Print selected issues for verification
-for cluster, issue in selected_issues.items():
-    print(f"\nCluster {cluster} (Selected Issue):")
-    print(issue[:300], "...")  # Truncate for readability
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+import os
+import json
+import hashlib
+from jsonl_store import iter_records, resolve_records_path, write_records
+from summary_budget import DEFAULT_SUMMARY_TOKENS, fit_summary_budget, omission_note
+
+# Summaries of the PRs the analysis scripts look at (unmerged, with comments and review
+# comments), computed once per PR and stored in pr_summaries/<owner_repo>.jsonl. A stored
+# summary is reused as long as the scraped record, the token budget and SUMMARY_VERSION
+# are unchanged, so generate_summary.py, generate_reasons.py, classify_PR_among_15_reasons.py
+# and count_reasons.py share the work instead of each re-summarizing the whole repo.
+BASE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+STORE_DIR = os.path.join(BASE_DIR, "pr_summaries")
+SUMMARY_VERSION = 2  # bump when json_to_summary or summary_budget change the text
+FEATURES_FIELD = "hasLockedReason_merged_numComments_numReviewComments"
+
+
+def json_to_summary(data):
+    """
+    Text summary of a scraped PR for the LLM prompts, and its features:
+    (summary, has_locked_reason, merged, num_comments, num_review_comments).
+    """
+    has_locked_reason = False
+    merged = False
+    num_comments = 0
+    num_review_comments = 0
+
+    parts = [
+        f"Pull Request '{data['number']}' titled '{data['title']}' was authored by a {data['user']['type']}, who is associated as a {data['author_association']}. "
+        f"\nIt was created at {data['created_at']}, and was closed at {data['closed_at']} {('by a ' + data['closed_by']['type']) if data.get('closed_by') else 'N/A'}.\n"
+    ]
+
+    labels = data.get('labels')
+    if labels:
+        parts.append('The PR has labels: ')
+        parts.append(', '.join(f"{label['name']} - {label['description']}" for label in labels))
+        parts.append('. \n')
+
+    if data.get('locked') and data.get('active_lock_reason'):
+        has_locked_reason = True
+        parts.append(f"PR was locked because of {data['active_lock_reason']}.\n")
+
+    if data['body']:
+        parts.append(f"It has a body of '{data['body']}'\n")
+
+    comments = data.get('comments_url_body')
+    if comments:
+        num_comments = len(comments)
+        parts.append("PR has comments:\n")
+        parts.extend(f"'{comment['body']}' by a {comment['author_association']} of type {comment['user']['type']} on {comment['created_at']}\n"
+                     for comment in comments)
+        parts.append('\n')
+
+    if 'pull_request' in data:
+        if data['pull_request']['merged_at']:
+            merged = True
+            parts.append(f"It was merged at {data['pull_request']['merged_at']} by a {data['pull_request_url_body']['merged_by']['type']}.\n ")
+
+        review_comments = data['pull_request_url_body']['review_comments_url_body']
+        if review_comments:
+            num_review_comments = len(review_comments)
+            parts.append("PR has review comments:\n")
+            for review in review_comments:
+                if review and review.get('user'):  # Ensure review and user exist
+                    parts.append(f"'{review.get('body', 'No body available')}' by a {review.get('author_association', 'Unknown')} of type {review['user'].get('type', 'Unknown')} on {review.get('created_at', 'Unknown date')}\n")
+            parts.append('\n')
+
+    return ''.join(parts).strip(), has_locked_reason, merged, num_comments, num_review_comments
+
+
+def is_analyzed_pr(entry):
+    """The PRs the analysis scripts summarize: unmerged, with at least one comment and one review comment."""
+    pull_request = entry.get('pull_request')
+    if not pull_request or pull_request.get('merged_at'):
+        return False
+    review_comments = (entry.get('pull_request_url_body') or {}).get('review_comments_url_body')
+    return len(entry.get('comments_url_body', [])) > 0 and bool(review_comments)
+
+
+def record_hash(entry):
+    """
+    Version hash of a scraped record. GitHub bumps `updated_at` of an issue on edits, relabels,
+    locks and closes, and of a comment when it is edited, so those and the comment ids stand for
+    the content; author associations are included since they are re-read on every scrape.
+    Hashing the whole record cost about as much as summarizing it.
+    """
+    pull_request_data = entry.get('pull_request_url_body') or {}
+    fields = [entry.get('html_url'), entry.get('updated_at'), entry.get('author_association')]
+    for comments in (entry.get('comments_url_body') or [], pull_request_data.get('review_comments_url_body') or []):
+        fields.append([(comment.get('id'), comment.get('updated_at') or comment.get('body'), comment.get('author_association'))
+                       for comment in comments if comment])
+    return hashlib.sha1(repr(fields).encode("utf-8")).hexdigest()
+
+
+def summary_key(entry, summary_tokens):
+    return f"{SUMMARY_VERSION}:{summary_tokens}:{record_hash(entry)}"
+
+
+def summarize(entry, summary_tokens=DEFAULT_SUMMARY_TOKENS, key=None):
+    """The stored record of one PR: its summary fitted to `summary_tokens`, plus features."""
+    trimmed, dropped = fit_summary_budget(entry, summary_tokens)
+    summary, has_locked_reason, merged, _, _ = json_to_summary(trimmed)
+    # Comment counts come from the full record, not from what fit into the budget
+    review_comments = (entry.get('pull_request_url_body') or {}).get('review_comments_url_body') or []
+    record = {
+        "url": entry["html_url"],
+        "number": entry["number"],
+        "summary": summary + omission_note(dropped),
+        FEATURES_FIELD: [has_locked_reason, merged, len(entry.get('comments_url_body') or []), len(review_comments)],
+        "summary_key": key or summary_key(entry, summary_tokens),
+    }
+    if dropped:
+        record["dropped"] = dropped
+    return record
+
+
+def store_path(repo):
+    return os.path.join(STORE_DIR, f"{repo.replace('/', '_')}.jsonl")
+
+
+def source_state(input_file, summary_tokens):
+    """What the store of a repo was built from; while it matches, the scraped data is not read at all."""
+    stat = os.stat(input_file)
+    return {"source": os.path.basename(input_file), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns,
+            "summary_version": SUMMARY_VERSION, "summary_tokens": summary_tokens}
+
+
+def build_store(repo, summary_tokens=DEFAULT_SUMMARY_TOKENS, data_dir=None):
+    """
+    Bring the summary store of `repo` up to date with its scraped data, re-summarizing only
+    PRs whose record changed; if the scraped file itself is unchanged, only the store is read.
+    Returns (records, records in the scraped data, summaries reused), or (None, 0, 0) if the
+    repo has not been scraped.
+    """
+    repo_path = repo.replace("/", "_")
+    input_file = resolve_records_path(os.path.join(data_dir or os.path.join(BASE_DIR, "scraped_data"), repo_path))
+    if not input_file:
+        return None, 0, 0
+
+    path = store_path(repo)
+    meta_path = path[:-len(".jsonl")] + ".meta.json"
+    state = source_state(input_file, summary_tokens)
+    if os.path.exists(path) and os.path.exists(meta_path):
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta["state"] == state:
+            records = list(iter_records(path))
+            return records, meta["records_read"], len(records)
+
+    stored = {record["url"]: record for record in iter_records(path)} if os.path.exists(path) else {}
+    records = []
+    total = reused = 0
+    for entry in iter_records(input_file):  # streamed, so the whole repo is never held in memory
+        total += 1
+        if not is_analyzed_pr(entry):
+            continue
+        key = summary_key(entry, summary_tokens)
+        record = stored.get(entry["html_url"])
+        if record is not None and record["summary_key"] == key:
+            reused += 1
+        else:
+            record = summarize(entry, summary_tokens, key)
+        records.append(record)
+
+    os.makedirs(STORE_DIR, exist_ok=True)
+    if reused < len(records) or len(records) != len(stored):
+        write_records(path, records)
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump({"state": state, "records_read": total}, f)
+    return records, total, reused
+
+
+def load_summaries(repo, summary_tokens=DEFAULT_SUMMARY_TOKENS):
+    """
+    Pipeline items (url, number, summary, features, dropped) of the analyzed PRs of `repo`,
+    from the refreshed summary store, and the number of scraped records. None if not scraped.
+    """
+    records, total, reused = build_store(repo, summary_tokens)
+    if records is None:
+        return None, 0
+    print(f"{repo}: {len(records)} PR summaries ({reused} reused from {store_path(repo)}) out of {total} records")
+    return [{k: v for k, v in record.items() if k != "summary_key"} for record in records], total
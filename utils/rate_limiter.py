@@ -0,0 +1,129 @@
+import os
+import time
+import threading
+
+DEFAULT_LIMIT = 5000  # assumed budget of a token before its first response is seen
+RATE_LIMITED_STATUSES = (403, 429)
+
+
+def load_tokens_from_env(prefix="GITHUB_AUTH_TOKEN"):
+    """Collect GITHUB_AUTH_TOKEN, GITHUB_AUTH_TOKEN_2, GITHUB_AUTH_TOKEN_3, ... as (name, token) pairs."""
+    tokens = []
+    if os.getenv(prefix):
+        tokens.append((prefix, os.getenv(prefix)))
+    i = 2
+    while os.getenv(f"{prefix}_{i}"):
+        tokens.append((f"{prefix}_{i}", os.getenv(f"{prefix}_{i}")))
+        i += 1
+    return tokens
+
+
+class TokenBudget:
+    """What we know about one token's quota for one rate limit resource (core, graphql, ...)."""
+
+    def __init__(self, name, token):
+        self.name = name
+        self.token = token
+        self.remaining = DEFAULT_LIMIT
+        self.limit = DEFAULT_LIMIT
+        self.reset_at = 0
+        self.blocked_until = 0  # secondary rate limit / Retry-After
+        self.requests = 0
+        self.throttled = 0
+
+
+class RateLimitScheduler:
+    """
+    Routes each request to the token with the most remaining quota and only sleeps when every
+    token is exhausted or blocked by a secondary rate limit. `clock` and `sleep` can be replaced
+    with a fake clock in tests.
+    """
+
+    def __init__(self, tokens, buffer=20, clock=time.time, sleep=time.sleep):
+        if not tokens:
+            raise ValueError("RateLimitScheduler needs at least one token")
+        self.tokens = tokens
+        self.buffer = buffer  # requests kept in reserve on every token
+        self.clock = clock
+        self.sleep = sleep
+        self.lock = threading.Lock()
+        self.budgets = {}  # resource -> {token name -> TokenBudget}
+        self.total_sleep = 0.0
+
+    def _budgets(self, resource):
+        if resource not in self.budgets:
+            self.budgets[resource] = {name: TokenBudget(name, token) for name, token in self.tokens}
+        return self.budgets[resource]
+
+    def _available(self, budget, now):
+        if budget.blocked_until > now:
+            return False
+        return budget.remaining > self.buffer or budget.reset_at <= now
+
+    def acquire(self, resource="core"):
+        """Reserve one request on the best token, sleeping until one frees up if all are exhausted."""
+        while True:
+            with self.lock:
+                now = self.clock()
+                budgets = self._budgets(resource).values()
+                available = [b for b in budgets if self._available(b, now)]
+                if available:
+                    budget = max(available, key=lambda b: b.remaining if b.reset_at > now else b.limit)
+                    if budget.reset_at <= now:
+                        budget.remaining = budget.limit  # the window has rolled over since the last response
+                    budget.remaining -= 1
+                    budget.requests += 1
+                    return budget.name, budget.token
+
+                wait = min(max(b.blocked_until, b.reset_at if b.remaining <= self.buffer else 0) for b in budgets) - now
+            wait = max(wait, 1)
+            print(f"All tokens rate limited for {resource}. Waiting {wait:.0f} seconds...")
+            self.total_sleep += wait
+            self.sleep(wait)
+
+    def update(self, name, response, resource="core"):
+        """
+        Record the quota reported by a response. Returns False if the response was rejected
+        by a primary or secondary rate limit and the request should be retried.
+        """
+        headers = response.headers
+        with self.lock:
+            now = self.clock()
+            budget = self._budgets(headers.get('X-RateLimit-Resource', resource))[name]
+            if 'X-RateLimit-Remaining' in headers:
+                budget.remaining = int(headers['X-RateLimit-Remaining'])
+                budget.limit = int(headers.get('X-RateLimit-Limit', budget.limit))
+                budget.reset_at = int(headers.get('X-RateLimit-Reset', 0))
+
+            if response.status_code not in RATE_LIMITED_STATUSES:
+                return True
+            if headers.get('Retry-After'):
+                budget.blocked_until = now + int(headers['Retry-After'])
+            elif budget.remaining == 0:
+                budget.blocked_until = budget.reset_at
+            else:
+                return True  # a plain 403 (permissions), not a rate limit
+            budget.throttled += 1
+            return False
+
+    def metrics(self):
+        """Snapshot of every token's budget, for logging."""
+        with self.lock:
+            now = self.clock()
+            return {
+                'total_sleep_seconds': round(self.total_sleep, 1),
+                'resources': {
+                    resource: {
+                        b.name: {
+                            'remaining': b.remaining,
+                            'limit': b.limit,
+                            'reset_in': max(round(b.reset_at - now), 0),
+                            'blocked_for': max(round(b.blocked_until - now), 0),
+                            'requests': b.requests,
+                            'throttled': b.throttled,
+                        }
+                        for b in budgets.values()
+                    }
+                    for resource, budgets in self.budgets.items()
+                },
+            }
@@ -0,0 +1,90 @@
+import os
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from jsonl_store import RECORD_SUFFIXES, iter_records, write_records
+from link_extractor import extract_all_links, is_pull_request, links_hash
+from merge_pages import SCRAPED_DIR, list_page_files
+from repos import repos
+
+# Recomputes `links_to` for issues that are already scraped, so a change to link_extractor.py
+# does not mean scraping again. Records whose texts and extractor version hash to the stored
+# `links_hash` are left alone, and files with no stale record are not rewritten:
+#   python utils/reextract_links.py --processes 16
+
+
+def is_stale(issue):
+    return issue.get('links_hash') != links_hash(issue, is_pull_request(issue))
+
+
+def refresh_links(issue):
+    """Re-extract the links of one issue if its texts or the extractor changed since the last run."""
+    is_pr = is_pull_request(issue)
+    text_hash = links_hash(issue, is_pr)
+    if issue.get('links_hash') != text_hash:
+        links = extract_all_links(issue, is_pr)
+        if links:
+            issue['links_to'] = links
+        else:
+            issue.pop('links_to', None)
+        issue['links_hash'] = text_hash
+    return issue
+
+
+def reextract_file(path):
+    """
+    Refresh the links of every record in a page or merged file. A first pass only hashes,
+    so up-to-date files are never rewritten; otherwise records are streamed into an atomic rewrite.
+    Returns (path, records, re-extracted records).
+    """
+    total = stale = 0
+    for issue in iter_records(path):
+        total += 1
+        stale += is_stale(issue)
+    if stale:
+        write_records(path, (refresh_links(issue) for issue in iter_records(path)))
+    return path, total, stale
+
+
+def repo_files(repo, scraped_dir=SCRAPED_DIR):
+    """Page files and merged files of a repo, in any supported format."""
+    repo_path = repo.replace("/", "_")
+    input_dir = os.path.join(scraped_dir, repo_path)
+    if not os.path.exists(input_dir):
+        print(f"No data found for {repo}. Skipping...")
+        return []
+    merged_files = [
+        file_name for file_name in os.listdir(input_dir)
+        if file_name.startswith(f"{repo_path}_merged") and any(file_name.endswith(suffix) for suffix in RECORD_SUFFIXES)
+    ]
+    return [os.path.join(input_dir, file_name) for file_name in list_page_files(input_dir) + sorted(merged_files)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-extract links_to for already scraped issues.")
+    parser.add_argument("paths", nargs="*", help="page or merged files to process (default: every repo in repos.py)")
+    parser.add_argument("--scraped-dir", default=SCRAPED_DIR)
+    parser.add_argument("--processes", type=int, default=os.cpu_count(), help="files processed in parallel")
+    args = parser.parse_args()
+
+    paths = args.paths or [path for repo in repos for path in repo_files(repo, args.scraped_dir)]
+    start = time.perf_counter()
+    total_records = total_stale = 0
+    with ProcessPoolExecutor(max_workers=args.processes) as executor:
+        futures = {executor.submit(reextract_file, path): path for path in paths}
+        for future in as_completed(futures):
+            try:
+                path, records, stale = future.result()
+            except Exception as e:
+                print(f"Error re-extracting links in {futures[future]}: {e}")
+                continue
+            total_records += records
+            total_stale += stale
+            print(f"{path}: {stale}/{records} records re-extracted" if stale else f"{path}: up to date")
+
+    elapsed = time.perf_counter() - start
+    print(f"Re-extracted {total_stale} of {total_records} records in {len(paths)} files in {elapsed:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
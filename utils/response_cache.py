@@ -0,0 +1,81 @@
+import json
+import time
+import zlib
+import hashlib
+from urllib.parse import urlencode
+from sqlite_lru import SQLiteLRU
+
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3  # 2 GiB of compressed bodies
+
+
+def request_string(url, params=None):
+    return url if not params else f"{url}?{urlencode(sorted(params.items()))}"
+
+
+def cache_key(url, params=None, scope="public"):
+    """Content address of a request: hash of the token scope, URL and query parameters."""
+    return hashlib.sha256(f"{scope}\n{request_string(url, params)}".encode("utf-8")).hexdigest()
+
+
+class ResponseCache(SQLiteLRU):
+    """
+    On-disk cache of GitHub API responses in SQLite: zlib-compressed JSON bodies with their
+    ETag / Last-Modified validators and Link header, keyed by request and token scope.
+    Entries are evicted least recently used first once the compressed size exceeds `max_bytes`.
+
+    Closed issues are effectively immutable, so fresh entries are served without a request,
+    stale ones are revalidated with a conditional request (GitHub does not count 304 Not
+    Modified against the rate limit), and replay mode never touches the network.
+    """
+
+    label = "Response cache"
+
+    def __init__(self, path, scope="public", max_bytes=DEFAULT_MAX_BYTES):
+        self.scope = scope  # keep responses fetched with tokens that see private repos apart
+        super().__init__(path, "http_responses", "url TEXT, etag TEXT, last_modified TEXT, link TEXT, "
+                                                 "body BLOB, size INTEGER, fetched_at REAL, accessed_at REAL", max_bytes)
+        self._import_validator_store()
+
+    def _import_validator_store(self):
+        """
+        Move the rows of the `responses` table written by earlier versions (uncompressed bodies,
+        validators and Link header keyed by request string) into http_responses, then drop it.
+        Tables from before Link pagination have no `link` column; their rows get fetched_at 0, so
+        they are revalidated (and their Link header fetched) before being served.
+        """
+        if not self.conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'responses'").fetchone():
+            return
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(responses)")}
+        validity = "fetched_at, link" if "link" in columns else "0, NULL"
+        now = time.time()
+        for request, etag, last_modified, body, fetched_at, link_header in self.conn.execute(
+                f"SELECT key, etag, last_modified, body, {validity} FROM responses").fetchall():
+            blob = zlib.compress(body.encode("utf-8"))
+            key = hashlib.sha256(f"{self.scope}\n{request}".encode("utf-8")).hexdigest()
+            self.conn.execute("INSERT OR IGNORE INTO http_responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                              (key, request, etag, last_modified, link_header, blob, len(blob), fetched_at, now))
+        self.conn.execute("DROP TABLE responses")
+        self.conn.commit()
+        self.total_bytes = self.stored_bytes()
+
+    def get(self, url, params=None):
+        """Return {'etag', 'last_modified', 'link', 'body', 'fetched_at'} for a request, or None on a miss."""
+        row = self.lookup(cache_key(url, params, self.scope), "etag, last_modified, link, body, fetched_at")
+        if row is None:
+            return None
+        return {'etag': row[0], 'last_modified': row[1], 'link': row[2],
+                'body': json.loads(zlib.decompress(row[3])), 'fetched_at': row[4]}
+
+    def put(self, url, params, etag, last_modified, body, link=None):
+        blob = zlib.compress(json.dumps(body).encode("utf-8"))
+        self.store(cache_key(url, params, self.scope),
+                   {'url': url, 'etag': etag, 'last_modified': last_modified, 'link': link, 'body': blob,
+                    'fetched_at': time.time()}, len(blob))
+
+    def touch(self, url, params=None):
+        """Mark a stored response as just revalidated (after a 304)."""
+        with self.lock:
+            now = time.time()
+            self.conn.execute("UPDATE http_responses SET fetched_at = ?, accessed_at = ? WHERE key = ?",
+                              (now, now, cache_key(url, params, self.scope)))
+            self.conn.commit()
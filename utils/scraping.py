@@ -1,149 +1,359 @@
 import os
+import re
 import json
 import time
-import requests
+import hashlib
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
-from link_extractor import extract_all_links
+import graphql_fetcher
+from checkpoint_store import CheckpointStore
+from jsonl_store import COMPRESSION_SUFFIXES, write_records
+from link_extractor import extract_all_links, is_pull_request, links_hash
+from rate_limiter import RateLimitScheduler, load_tokens_from_env
 from repos import repos
+from response_cache import ResponseCache
+from transport import TransportError, create_transport
 
 # Load environment variables
 load_dotenv()
 
-CHECKPOINT_FILE = "checkpoint.json"
+CHECKPOINT_DB = "checkpoint.sqlite"
+CHECKPOINT_FILE = "checkpoint.json"  # legacy JSON checkpoints, imported into CHECKPOINT_DB
+INCREMENTAL_FILE = "incremental.json"
+RESPONSE_CACHE_FILE = "response_cache.sqlite"
+API_URL = os.getenv("GITHUB_API_URL", "https://api.github.com")  # point at a stub server for testing
+MAX_WORKERS = 8  # concurrent detail requests per page
+PER_PAGE = 100  # largest page size the REST API allows
 
-def load_checkpoint():
-    """Load checkpoint file to resume scraping from last saved page."""
-    if os.path.exists(CHECKPOINT_FILE):
-        with open(CHECKPOINT_FILE, "r") as f:
-            return json.load(f)
-    return {}
+transport = create_transport("sync", pool_size=MAX_WORKERS)  # replaced in main() by --transport
+scheduler = None  # RateLimitScheduler over every GITHUB_AUTH_TOKEN*, created in main()
+response_cache = None  # on-disk ResponseCache, enabled in main() by --cache, --incremental or --replay
+cache_ttl = 0  # seconds a cached response is served without revalidating, set by --cache-ttl
+replay = False  # serve everything from response_cache and never touch the network, set by --replay
+checkpoint_store = None  # CheckpointStore shared by all repo workers, created in main()
+max_thread_items = None  # cap on comments / review comments fetched per issue, set by --max-thread-items
+page_suffix = ".json"  # ".json" (indented array) or ".jsonl" plus compression suffix, set by --format / --compress
 
-def save_checkpoint(repo, page):
-    """Save the last fetched page for a repository."""
-    checkpoint = load_checkpoint()
-    checkpoint[repo] = page
-    with open(CHECKPOINT_FILE, "w") as f:
-        json.dump(checkpoint, f, indent=2)
+def send_with_token(send, headers, resource="core"):
+    """
+    Send a request authorised with the token that has the most budget left, retrying
+    on another token (or after a wait) when it is rejected by a rate limit.
+    """
+    while True:
+        name, token = scheduler.acquire(resource)
+        response = send({**headers, "Authorization": f"Bearer {token}"})
+        if scheduler.update(name, response, resource):
+            return response
+
+def next_page_url(link_header):
+    """Return the rel="next" URL of a Link header, or None on the last page."""
+    match = re.search(r'<([^>]+)>;\s*rel="next"', link_header or "")
+    return match.group(1) if match else None
+
+def conditional_get(url, headers, params=None, max_age=None):
+    """
+    GET a URL through the response cache. Cached responses younger than `max_age` seconds
+    (default: cache_ttl) are served without a request, older ones are revalidated with
+    If-None-Match / If-Modified-Since. Returns (data, next_url): the JSON data and the
+    rel="next" page from the Link header.
+    """
+    cached = response_cache.get(url, params) if response_cache else None
+    max_age = cache_ttl if max_age is None else max_age
+    if cached and (replay or time.time() - cached['fetched_at'] < max_age):
+        return cached['body'], next_page_url(cached['link'])
+    if replay:
+        raise TransportError(f"{url} is not in the response cache")
+    if cached:
+        headers = dict(headers)
+        if cached['etag']:
+            headers['If-None-Match'] = cached['etag']
+        if cached['last_modified']:
+            headers['If-Modified-Since'] = cached['last_modified']
+
+    response = send_with_token(lambda headers: transport.get(url, params=params, headers=headers), headers)
+    if response.status_code == 304 and cached:
+        response_cache.touch(url, params)
+        return cached['body'], next_page_url(response.headers.get('Link') or cached['link'])
+    response.raise_for_status()
+
+    data = response.json()
+    etag = response.headers.get('ETag')
+    last_modified = response.headers.get('Last-Modified')
+    link = response.headers.get('Link')
+    if response_cache:
+        response_cache.put(url, params, etag, last_modified, data, link)
+    return data, next_page_url(link)
 
-def fetch_data(url, headers):
+def fetch_data(url, headers, params=None):
     """Fetch JSON data from a given URL with rate limit handling."""
     try:
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
-        
-        # Handle rate limits
-        remaining = int(response.headers.get('X-RateLimit-Remaining', 0))
-        if remaining < 1:
-            reset_time = int(response.headers.get('X-RateLimit-Reset', 0))
-            sleep_time = max(reset_time - time.time(), 0)
-            print(f"Rate limit reached. Waiting {sleep_time} seconds...")
-            time.sleep(sleep_time)
-        
-        return response.json()
-    except requests.exceptions.RequestException as e:
+        data, _ = conditional_get(url, headers, params)
+        return data
+    except TransportError as e:
         print(f"Error fetching {url}: {e}")
         return None
 
-def fetch_issues(repo, headers):
-    """Fetch closed issues for a given repo and save after each page."""
-    url = f"https://api.github.com/repos/{repo}/issues"
-    checkpoint = load_checkpoint()
-    start_page = checkpoint.get(repo, 1)  # Resume from last saved page
-    
-    params = {"state": "closed", "per_page": 100, "page": start_page}
+def iter_items(url, headers, max_items=None):
+    """
+    Lazily yield the items of a paginated list endpoint, requesting PER_PAGE items at a time
+    and following Link: rel="next". Stops after `max_items` items when given.
+    """
+    params = {"per_page": min(PER_PAGE, max_items) if max_items else PER_PAGE}
+    count = 0
+    while url and (max_items is None or count < max_items):
+        data, url = conditional_get(url, headers, params)
+        params = None  # the next link already carries per_page and page
+        for item in data:
+            if max_items is not None and count >= max_items:
+                return
+            yield item
+            count += 1
 
-    while True:
-        try:
-            response = requests.get(url, params=params, headers=headers, timeout=10)
-            response.raise_for_status()
-
-            # Handle rate limits
-            remaining = int(response.headers.get('X-RateLimit-Remaining', 0))
-            if remaining < 20: # always keep a buffer of 20 requests
-                reset_time = int(response.headers.get('X-RateLimit-Reset', 0))
-                sleep_time = max(reset_time - time.time(), 0)
-                print(f"Rate limit reached. Waiting {sleep_time} seconds...")
-                time.sleep(sleep_time)
-
-            data = response.json()
-            if not data:
-                break
-            
-            for issue in data:
-                is_pr = False
-                if 'pull_request' in issue and 'url' in issue['pull_request']:
-                    is_pr = True
-                    pr_url = issue['pull_request']['url']
-                    pr_data = fetch_data(pr_url, headers)
-                    if pr_data:
-                        issue['pull_request_url_body'] = pr_data
-                        review_comments_url = pr_data.get('review_comments_url')
-                        if review_comments_url:
-                            issue['pull_request_url_body']['review_comments_url_body'] = fetch_data(review_comments_url, headers)
-                        
-                        # also get commit message
-                        commmits_url = pr_data.get('commits_url')
-                        if commmits_url:
-                            commits_data = fetch_data(commmits_url, headers)
-                            if commits_data:
-                                issue['pull_request_url_body']['commit_message'] = commits_data[0]['commit']['message']
-
-
-                # fetch comments from the comments url
-                comments_url = issue['comments_url']
-                if comments_url:
-                    comments_data = fetch_data(comments_url, headers)
-                    if comments_data:
-                        issue['comments_url_body'] = comments_data
+def fetch_all(url, headers, max_items=None):
+    """Fetch every item of a paginated list endpoint, or None if the first page fails."""
+    items = []
+    try:
+        for item in iter_items(url, headers, max_items):
+            items.append(item)
+    except TransportError as e:
+        print(f"Error fetching {url} after {len(items)} items: {e}")
+        return items or None
+    return items
+
+def fetch_graphql(query, variables, headers):
+    """Run a GraphQL query with rate limit handling, returning its 'data' or None on failure."""
+    body = {"query": query, "variables": variables}
+    # GraphQL has no validators, so cached results are keyed by a hash of the query
+    cache_params = {"query": hashlib.sha256(json.dumps(body, sort_keys=True).encode("utf-8")).hexdigest()}
+    cached = response_cache.get(f"{API_URL}/graphql", cache_params) if response_cache else None
+    if cached and (replay or time.time() - cached['fetched_at'] < cache_ttl):
+        return cached['body']
+    if replay:
+        print(f"GraphQL query for {variables} is not in the response cache")
+        return None
+
+    try:
+        response = send_with_token(lambda headers: transport.post(f"{API_URL}/graphql", body, headers=headers),
+                                   headers, resource="graphql")
+        response.raise_for_status()
+
+        result = response.json()
+        if result.get('errors'):
+            print(f"GraphQL errors: {result['errors']}")
+        elif response_cache:
+            response_cache.put(f"{API_URL}/graphql", cache_params, None, None, result.get('data'))
+        return result.get('data')
+    except TransportError as e:
+        print(f"Error running GraphQL query: {e}")
+        return None
+
+def fetch_page_details(issues, headers, executor):
+    """Fetch PR bodies, review comments, commits and comments for a whole page concurrently."""
+    pr_futures = {}
+    comments_futures = {}
+    for i, issue in enumerate(issues):
+        if 'pull_request' in issue and 'url' in issue['pull_request']:
+            pr_futures[executor.submit(fetch_data, issue['pull_request']['url'], headers)] = i
+        if issue.get('comments_url'):
+            comments_futures[i] = executor.submit(fetch_all, issue['comments_url'], headers, max_thread_items)
+
+    # Second stage: review comments and commits are only known once the PR body arrives
+    detail_futures = {}
+    for future in as_completed(pr_futures):
+        i = pr_futures[future]
+        pr_data = future.result()
+        if not pr_data:
+            continue
+        issues[i]['pull_request_url_body'] = pr_data
+        review_comments_url = pr_data.get('review_comments_url')
+        commits_url = pr_data.get('commits_url')
+        detail_futures[i] = (
+            executor.submit(fetch_all, review_comments_url, headers, max_thread_items) if review_comments_url else None,
+            # PR commits are listed oldest first, so the first page of one item is the first commit
+            executor.submit(fetch_data, commits_url, headers, {"per_page": 1}) if commits_url else None,
+        )
+
+    for i, (review_future, commits_future) in detail_futures.items():
+        pr_data = issues[i]['pull_request_url_body']
+        if review_future:
+            pr_data['review_comments_url_body'] = review_future.result()
+        # also get commit message
+        if commits_future:
+            commits_data = commits_future.result()
+            if commits_data:
+                pr_data['commit_message'] = commits_data[0]['commit']['message']
+
+    # fetch comments from the comments url
+    for i, future in comments_futures.items():
+        comments_data = future.result()
+        if comments_data:
+            issues[i]['comments_url_body'] = comments_data
+
+def fetch_issues(repo, headers, max_workers=MAX_WORKERS, incremental=False, backend="rest"):
+    """
+    Fetch closed issues for a given repo and save after each page.
+    With `incremental`, only fetch issues updated since the last recorded `updated_at`.
+    With the "graphql" backend, comments, review comments and commits come from batched GraphQL queries.
+    """
+    url = f"{API_URL}/repos/{repo}/issues"
+    state = checkpoint_store.get_state(repo)
+
+    if replay:
+        # Rebuild every page from the cache without touching the checkpoints
+        run = None
+        params = {"state": "closed", "per_page": 100, "page": 1}
+    elif incremental and state.get('since'):
+        # Oldest updates first, so issues updated mid-run move to pages we have not reached yet
+        run = state.get('run') or time.strftime("%Y%m%dT%H%M%SZ", time.gmtime())
+        start_page = state.get('page', 1)  # Resume an interrupted update run
+        params = {"state": "closed", "per_page": 100, "page": start_page,
+                  "sort": "updated", "direction": "asc", "since": state['since']}
+        print(f"{repo}: fetching issues updated since {state['since']}")
+    else:
+        if incremental:
+            print(f"{repo}: no previous run recorded, doing a full crawl")
+        run = None
+        start_page = checkpoint_store.get_page(repo)  # Resume from last saved page
+        params = {"state": "closed", "per_page": 100, "page": start_page}
+    latest = state.get('latest') or state.get('since')
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while True:
+            try:
+                data, _ = conditional_get(url, headers, params, max_age=0)  # listings change, always revalidate
+
+                if not data:
+                    # Crawl finished: later incremental runs start from the newest update seen
+                    if latest:
+                        checkpoint_store.set_state(repo, {'since': latest})
+                    break
+
+                if backend == "graphql":
+                    graphql_fetcher.fetch_page_details(repo, data, lambda query, variables: fetch_graphql(query, variables, headers))
+                else:
+                    fetch_page_details(data, headers, executor)
+
+                for issue in data:
+                    is_pr = is_pull_request(issue)
+
+                    # scrape the body, comments, review_comments, commit messages to find links
+                    links = extract_all_links(issue, is_pr)
+                    if links:
+                        issue['links_to'] = links
+                    issue['links_hash'] = links_hash(issue, is_pr)
+
+                    if not latest or issue['updated_at'] > latest:
+                        latest = issue['updated_at']
                 
-                # scrape the body, comments, review_comments, commit messages to find links
-                links = extract_all_links(issue, is_pr)
-                if links:
-                    issue['links_to'] = links
-            
-            print(f"{repo} Page {params['page']} Done")
-
-            # Save page immediately after processing
-            print(f"{repo}, page: {params["page"]}")
-            save_page_issues(repo, data, params["page"]) 
-            save_checkpoint(repo, params["page"] + 1)
-
-            params["page"] += 1
-
-        except requests.exceptions.RequestException as e:
-            print(f"Error fetching issues for {repo}: {e}")
-            break
+                print(f"{repo} Page {params['page']} Done")
+
+                # Save page immediately after processing
+                print(f"{repo}, page: {params["page"]}")
+                save_page_issues(repo, data, params["page"], run) 
+                if run:
+                    checkpoint_store.set_state(repo, {'since': state['since'], 'latest': latest,
+                                                   'run': run, 'page': params["page"] + 1})
+                elif not replay:
+                    checkpoint_store.set_page(repo, params["page"] + 1)
+                    checkpoint_store.set_state(repo, {**state, 'latest': latest})
+
+                params["page"] += 1
+
+            except TransportError as e:
+                print(f"Error fetching issues for {repo}: {e}")
+                break
+    if response_cache:
+        print(f"{repo} response cache: {json.dumps(response_cache.stats())}")
+    if scheduler:
+        print(f"{repo} rate limit state: {json.dumps(scheduler.metrics())}")
     return
 
-def save_page_issues(repo, issue_list, page):
-    """Save the current page's issues."""
+def save_page_issues(repo, issue_list, page, run=None):
+    """Save the current page's issues. Pages of an incremental run are tagged with the run id."""
     repo_path = repo.replace("/", "_")
     output_dir = os.path.join("scraped_issues", repo_path)
     os.makedirs(output_dir, exist_ok=True)
-    output_file = os.path.join(output_dir, f"{repo_path}_page_{page}.json") 
+    prefix = f"{repo_path}_update_{run}" if run else repo_path
+    output_file = os.path.join(output_dir, f"{prefix}_page_{page}{page_suffix}") 
     
     try:
-        with open(output_file, 'w') as f:
-            json.dump(issue_list, f, indent=2)
+        if page_suffix == ".json":
+            with open(output_file, 'w') as f:
+                json.dump(issue_list, f, indent=2)
+        else:
+            write_records(output_file, issue_list)
         print(f"Saved {repo} page:{page} to {output_file}")
     except Exception as e:
         print(f"Error saving {repo} page:{page}: {e}")
 
 def main():
     """Main function to scrape issues for multiple repositories."""
+    global transport, response_cache, scheduler, checkpoint_store, max_thread_items, page_suffix, cache_ttl, replay
+
+    parser = argparse.ArgumentParser(description="Scrape closed issues and PRs from GitHub.")
+    parser.add_argument("--transport", choices=["sync", "async"], default="sync",
+                        help="pooled requests.Session (sync) or httpx.AsyncClient on an event loop (async)")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS, help="concurrent detail requests per page")
+    parser.add_argument("--backend", choices=["rest", "graphql"], default="rest",
+                        help="fetch issue details with per-issue REST calls or batched GraphQL queries")
+    parser.add_argument("--max-thread-items", type=int, default=None,
+                        help="cap on comments and review comments fetched per issue (default: all)")
+    parser.add_argument("--format", choices=["json", "jsonl"], default="json",
+                        help="save pages as indented JSON arrays or as JSON Lines, one issue per line")
+    parser.add_argument("--compress", choices=list(COMPRESSION_SUFFIXES), default="none",
+                        help="compression for --format jsonl pages")
+    parser.add_argument("--parallel", type=int, default=1, help="number of repos crawled concurrently")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only fetch issues updated since the last run, revalidating responses with ETags")
+    parser.add_argument("--cache", action="store_true", help=f"keep every response in {RESPONSE_CACHE_FILE}")
+    parser.add_argument("--cache-ttl", type=float, default=7 * 24 * 3600,
+                        help="seconds a cached response is reused without revalidating (default: 7 days)")
+    parser.add_argument("--cache-max-mb", type=int, default=2048, help="size cap of the response cache")
+    parser.add_argument("--cache-scope", default="public",
+                        help="cache namespace; use a separate one for tokens that can see private repos")
+    parser.add_argument("--replay", action="store_true",
+                        help="rebuild pages offline from the response cache, e.g. after changing link extraction")
+    args = parser.parse_args()
+    if args.replay and args.incremental:
+        parser.error("--replay and --incremental cannot be combined")
     
-    github_token = os.getenv('GITHUB_AUTH_TOKEN')
-    if not github_token:
-        raise ValueError("GITHUB_AUTH_TOKEN not found in .env file")
+    if not args.replay:
+        tokens = load_tokens_from_env()
+        if not tokens:
+            raise ValueError("GITHUB_AUTH_TOKEN not found in .env file")
+        print(f"Using {len(tokens)} GitHub token(s)")
+        scheduler = RateLimitScheduler(tokens, buffer=20)  # always keep a buffer of 20 requests per token
     
     headers = {
-        "Accept": "application/vnd.github+json",
-        "Authorization": f"Bearer {github_token}"
+        "Accept": "application/vnd.github+json"
     }
-    
-    for repo in repos:
+    max_thread_items = args.max_thread_items
+    page_suffix = ".json" if args.format == "json" else ".jsonl" + COMPRESSION_SUFFIXES[args.compress]
+
+    transport.close()
+    # Repo workers share the transport pool, the token budgets and the checkpoint store
+    transport = create_transport(args.transport, pool_size=args.workers * args.parallel)
+    checkpoint_store = CheckpointStore(CHECKPOINT_DB, CHECKPOINT_FILE, INCREMENTAL_FILE)
+    if args.cache or args.incremental or args.replay:
+        response_cache = ResponseCache(RESPONSE_CACHE_FILE, args.cache_scope, args.cache_max_mb * 1024 ** 2)
+        # Issues returned by an incremental run were updated, so their details must be revalidated
+        cache_ttl = 0 if args.incremental else args.cache_ttl
+        replay = args.replay
+
+    def scrape_repo(repo):
         print(f"Scraping issues for {repo}...")
-        fetch_issues(repo, headers)
+        fetch_issues(repo, headers, args.workers, args.incremental, args.backend)
+    
+    try:
+        with ThreadPoolExecutor(max_workers=args.parallel) as repo_executor:
+            for future in as_completed([repo_executor.submit(scrape_repo, repo) for repo in repos]):
+                future.result()
+    finally:
+        transport.close()
+        checkpoint_store.close()
+        if response_cache:
+            response_cache.close()
     
     print("Scraping completed.")
 
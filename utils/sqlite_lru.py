@@ -0,0 +1,79 @@
+import time
+import sqlite3
+import threading
+
+# The storage shared by response_cache.ResponseCache and llm_cache.LLMCache: one SQLite table
+# of compressed entries keyed by a content hash, with their size and last access time.
+
+
+class SQLiteLRU:
+    """
+    SQLite table of entries keyed by a hash, evicted least recently used first once their
+    total `size` exceeds `max_bytes`. `columns` declares the table after its key and must
+    include `size INTEGER` and `accessed_at REAL`; subclasses decide what goes in the others.
+    """
+
+    label = "Cache"  # for the eviction message
+
+    def __init__(self, path, table, columns, max_bytes):
+        self.table = table
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(f"CREATE TABLE IF NOT EXISTS {table} (key TEXT PRIMARY KEY, {columns})")
+        self.conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_lru ON {table} (accessed_at)")
+        self.conn.commit()
+        self.total_bytes = self.stored_bytes()
+
+    def stored_bytes(self):
+        return self.conn.execute(f"SELECT COALESCE(SUM(size), 0) FROM {self.table}").fetchone()[0]
+
+    def lookup(self, key, columns, touch=True):
+        """The `columns` of the entry of `key`, marked as just used unless `touch` is false, or None on a miss."""
+        with self.lock:
+            row = self.conn.execute(f"SELECT {columns} FROM {self.table} WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            if touch:
+                self.conn.execute(f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?", (time.time(), key))
+                self.conn.commit()  # do not hold the write lock other connections are waiting for
+        return row
+
+    def store(self, key, values, size):
+        """Insert or replace the entry of `key` with `values` ({column: value}), evicting if the cache grows too big."""
+        row = dict(values, key=key, size=size, accessed_at=time.time())
+        with self.lock:
+            old = self.conn.execute(f"SELECT size FROM {self.table} WHERE key = ?", (key,)).fetchone()
+            self.conn.execute(f"INSERT OR REPLACE INTO {self.table} ({', '.join(row)}) VALUES ({', '.join('?' * len(row))})",
+                              list(row.values()))
+            self.total_bytes += size - (old[0] if old else 0)
+            if self.total_bytes > self.max_bytes:
+                self._evict(int(self.max_bytes * 0.9))
+            self.conn.commit()
+
+    def _evict(self, target_bytes):
+        """Delete least recently used entries until the cache is under `target_bytes`."""
+        rows = self.conn.execute(f"SELECT key, size FROM {self.table} ORDER BY accessed_at").fetchall()
+        evicted = []
+        for key, size in rows:
+            if self.total_bytes <= target_bytes:
+                break
+            evicted.append((key,))
+            self.total_bytes -= size
+        self.conn.executemany(f"DELETE FROM {self.table} WHERE key = ?", evicted)
+        print(f"{self.label} over {self.max_bytes} bytes, evicted {len(evicted)} entries")
+
+    def stats(self):
+        with self.lock:
+            entries = self.conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+        return {'entries': entries, 'bytes': self.total_bytes, 'hits': self.hits, 'misses': self.misses}
+
+    def close(self):
+        with self.lock:
+            self.conn.commit()
+            self.conn.close()
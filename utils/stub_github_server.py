@@ -0,0 +1,200 @@
+import os
+import re
+import json
+import hashlib
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+# Serves the recorded GitHub JSON in example_data/ so the scraper can run without api.github.com:
+#   python utils/stub_github_server.py --port 8000
+#   GITHUB_API_URL=http://127.0.0.1:8000 python -u utils/scraping.py
+EXAMPLE_DATA_DIR = os.path.join(os.path.dirname(__file__), "../example_data")
+RECORDED_ISSUES = ["demo_extended_issue.json", "processed_issue_no_PR.json"]
+GITHUB_API = "https://api.github.com"
+
+
+def load_json(file_path):
+    with open(file_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def rebase_urls(value, base_url):
+    """Rewrite every api.github.com URL in a recorded payload to point at the stub."""
+    if isinstance(value, dict):
+        return {k: rebase_urls(v, base_url) for k, v in value.items()}
+    if isinstance(value, list):
+        return [rebase_urls(v, base_url) for v in value]
+    if isinstance(value, str) and value.startswith(GITHUB_API):
+        return base_url + value[len(GITHUB_API):]
+    return value
+
+
+def graphql_actor(user):
+    return {'__typename': user['type'], 'login': user['login']} if user else None
+
+
+def graphql_comment(comment):
+    node = {
+        'databaseId': comment['id'], 'url': comment['html_url'], 'body': comment['body'],
+        'createdAt': comment['created_at'], 'updatedAt': comment['updated_at'],
+        'authorAssociation': comment['author_association'], 'author': graphql_actor(comment.get('user')),
+    }
+    if 'path' in comment:
+        node['path'] = comment['path']
+        node['diffHunk'] = comment.get('diff_hunk')
+    return node
+
+
+def single_page(nodes):
+    return {'totalCount': len(nodes), 'pageInfo': {'hasNextPage': False, 'endCursor': None}, 'nodes': nodes}
+
+
+def graphql_node(record):
+    """Answer issueOrPullRequest(number:) from a recorded extended issue."""
+    node = {'id': record['node_id'], 'comments': single_page([graphql_comment(c) for c in record.get('comments_url_body') or []])}
+    pr_data = record.get('pull_request_url_body')
+    if pr_data and pr_data.get('url'):
+        review_comments = [graphql_comment(c) for c in pr_data.get('review_comments_url_body') or []]
+        commit_message = pr_data.get('commit_message')
+        node.update({
+            'number': pr_data['number'], 'title': pr_data['title'], 'body': pr_data['body'],
+            'url': pr_data['html_url'], 'state': pr_data['state'].upper(), 'merged': bool(pr_data['merged_at']),
+            'mergedAt': pr_data['merged_at'], 'createdAt': pr_data['created_at'], 'updatedAt': pr_data['updated_at'],
+            'closedAt': pr_data['closed_at'], 'additions': pr_data.get('additions'), 'deletions': pr_data.get('deletions'),
+            'changedFiles': pr_data.get('changed_files'), 'author': graphql_actor(pr_data['user']),
+            'mergedBy': graphql_actor(pr_data.get('merged_by')),
+            'reviewThreads': single_page([{'id': f"{record['node_id']}-thread", 'comments': single_page(review_comments)}]
+                                         if review_comments else []),
+            'commits': {'totalCount': pr_data.get('commits', 1),
+                        'nodes': [{'commit': {'message': commit_message}}] if commit_message else []},
+        })
+    return node
+
+
+def build_routes(data_dir, base_url):
+    """
+    Split recorded extended issues back into the REST responses they were assembled from.
+    Returns a dict of path -> payload, a dict of repo -> list of bare issues and a dict of
+    (repo, number) -> GraphQL node for the /graphql endpoint.
+    """
+    routes = {}
+    issues_by_repo = {}
+    graphql_nodes = {}
+    for file_name in RECORDED_ISSUES:
+        issue = rebase_urls(load_json(os.path.join(data_dir, file_name)), base_url)
+        repo = urlsplit(issue['repository_url']).path[len("/repos/"):]
+        graphql_nodes[(repo, issue['number'])] = graphql_node(issue)
+        issue.pop('links_to', None)
+        comments = issue.pop('comments_url_body', None) or []
+        pr_data = issue.pop('pull_request_url_body', None)
+
+        routes[urlsplit(issue['comments_url']).path] = comments
+
+        if pr_data and pr_data.get('url'):
+            pr_data = dict(pr_data)
+            routes[urlsplit(pr_data['review_comments_url']).path] = pr_data.pop('review_comments_url_body', None) or []
+            commit_message = pr_data.pop('commit_message', None)
+            routes[urlsplit(pr_data['commits_url']).path] = [{"commit": {"message": commit_message}}] if commit_message else []
+            routes[urlsplit(pr_data['url']).path] = pr_data
+
+        issues_by_repo.setdefault(repo, []).append(issue)
+    return routes, issues_by_repo, graphql_nodes
+
+
+class StubGitHubHandler(BaseHTTPRequestHandler):
+    routes = {}
+    issues_by_repo = {}
+    graphql_nodes = {}
+
+    def do_POST(self):
+        if urlsplit(self.path).path != "/graphql":
+            return self.send_json({"message": "Not Found"}, status=404)
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        variables = request.get("variables") or {}
+        if "id" in variables:
+            # Follow-up page queries: recorded threads always fit in the first page
+            return self.send_json({"data": {"node": None}})
+
+        repo = f"{variables['owner']}/{variables['name']}"
+        aliases = re.findall(r"(\w+): issueOrPullRequest\(number: (\d+)\)", request["query"])
+        repository = {alias: self.graphql_nodes.get((repo, int(number))) for alias, number in aliases}
+        self.send_json({"data": {"repository": repository}})
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        if parts.path in self.routes:
+            payload = self.routes[parts.path]
+            query = parse_qs(parts.query)
+            if isinstance(payload, list) and "per_page" in query:
+                return self.send_list_page(parts.path, payload, int(query["per_page"][0]), int(query.get("page", ["1"])[0]))
+            return self.send_json(payload)
+
+        # /repos/{owner}/{repo}/issues?page=N: everything recorded is on page 1
+        if parts.path.startswith("/repos/") and parts.path.endswith("/issues"):
+            repo = parts.path[len("/repos/"):-len("/issues")]
+            query = parse_qs(parts.query)
+            page = int(query.get("page", ["1"])[0])
+            since = query.get("since", [""])[0]
+            issues = [i for i in self.issues_by_repo.get(repo, []) if i['updated_at'] >= since]
+            return self.send_json(issues if page == 1 else [])
+
+        self.send_json({"message": "Not Found"}, status=404)
+
+    def send_list_page(self, path, items, per_page, page):
+        """Serve one page of a list endpoint with a Link header, like the REST API does."""
+        extra_headers = {}
+        if page * per_page < len(items):
+            base_url = f"http://{self.headers['Host']}"
+            extra_headers["Link"] = f'<{base_url}{path}?per_page={per_page}&page={page + 1}>; rel="next"'
+        self.send_json(items[(page - 1) * per_page:page * per_page], extra_headers=extra_headers)
+
+    def send_json(self, payload, status=200, extra_headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        if status == 200 and self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self.send_response(status)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("X-RateLimit-Remaining", "5000")
+        self.send_header("X-RateLimit-Reset", "0")
+        for name, value in (extra_headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(port=0, data_dir=EXAMPLE_DATA_DIR):
+    """Start the stub in a background thread and return (server, base_url)."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), StubGitHubHandler)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    StubGitHubHandler.routes, StubGitHubHandler.issues_by_repo, StubGitHubHandler.graphql_nodes = build_routes(data_dir, base_url)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, base_url
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve recorded GitHub API responses from example_data/.")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--data-dir", default=EXAMPLE_DATA_DIR)
+    args = parser.parse_args()
+
+    server, base_url = start_server(args.port, args.data_dir)
+    print(f"Serving recorded GitHub API at {base_url} (repos: {', '.join(StubGitHubHandler.issues_by_repo)})")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+from llm_client import estimate_tokens
+
+# Token budget of one PR summary; the fixed parts of the prompt come on top of it
+DEFAULT_SUMMARY_TOKENS = 6000
+MAINTAINER_ASSOCIATIONS = ("OWNER", "MEMBER", "COLLABORATOR")
+KEEP_LAST = 3  # most recent comments, which usually explain the closing
+COMMENT_OVERHEAD = 25  # author association, user type and date rendered around each comment body
+HEADER_TOKENS = 150  # title, author, dates and labels
+TRUNCATION_MARK = " [...] "
+TRUNCATE_TIERS = 2  # closer, last KEEP_LAST and maintainer comments are shortened rather than dropped
+MIN_TRUNCATED_TOKENS = 50  # a shortened comment keeps at least this much of its body
+
+
+def truncate_text(text, max_tokens):
+    """Keep the start and the end of `text`, cutting the middle so it fits `max_tokens`."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    keep = max(0, max_tokens * 4 - len(TRUNCATION_MARK))
+    return text[:keep // 2] + TRUNCATION_MARK + text[len(text) - keep // 2:] if keep else ""
+
+
+def comment_tokens(comment):
+    return estimate_tokens(comment.get('body') or "") + COMMENT_OVERHEAD
+
+
+def _login(comment):
+    return (comment.get('user') or {}).get('login')
+
+
+def _priorities(comments, closer):
+    """
+    Rank of every comment, lower is kept first: the closer's last comment, then the last
+    KEEP_LAST comments, then maintainer comments, then everything else, newer before older.
+    """
+    closing = None
+    if closer:
+        closing = next((i for i in range(len(comments) - 1, -1, -1) if _login(comments[i]) == closer), None)
+    ranks = []
+    for i, comment in enumerate(comments):
+        if i == closing:
+            tier = 0
+        elif i >= len(comments) - KEEP_LAST:
+            tier = 1
+        elif comment.get('author_association') in MAINTAINER_ASSOCIATIONS:
+            tier = 2
+        else:
+            tier = 3
+        ranks.append((tier, -i))
+    return ranks
+
+
+def _select(comments, closer, budget):
+    """
+    The comments to keep within `budget` tokens as {index: comment}, plus the budget left over.
+    A high-priority comment that does not fit is cut in the middle to the budget left (a copy),
+    so the closing or a maintainer comment is not lost to one long earlier comment.
+    """
+    ranked = sorted((rank, i) for i, rank in enumerate(_priorities(comments, closer)))
+    # A shortened comment leaves room for the closer and last comments still to come
+    reserved = sum(comment_tokens(comments[i]) for (tier, _), i in ranked if tier <= 1)
+    kept = {}
+    for (tier, _), i in ranked:
+        cost = comment_tokens(comments[i])
+        if tier <= 1:
+            reserved -= cost
+        if cost <= budget:
+            kept[i] = comments[i]
+            budget -= cost
+        elif tier <= TRUNCATE_TIERS:
+            room = max(budget - reserved, MIN_TRUNCATED_TOKENS + COMMENT_OVERHEAD)
+            if room <= budget:
+                kept[i] = dict(comments[i], body=truncate_text(comments[i].get('body') or "", room - COMMENT_OVERHEAD))
+                budget -= comment_tokens(kept[i])
+    return kept, budget
+
+
+def _comment_id(comment):
+    return comment.get('id') or comment.get('created_at')
+
+
+def _dropped_ids(comments, kept):
+    return [_comment_id(comment) for i, comment in enumerate(comments) if i not in kept]
+
+
+def _truncated_ids(comments, kept):
+    return [_comment_id(comments[i]) for i in sorted(kept) if kept[i] is not comments[i]]
+
+
+def fit_summary_budget(data, max_tokens=DEFAULT_SUMMARY_TOKENS):
+    """
+    A copy of a scraped PR whose body, comments and review comments fit `max_tokens` when
+    rendered by json_to_summary, and a record of what was dropped (None if nothing was).
+    The body is cut in the middle to at most half the budget; comments are then kept by
+    priority (see _priorities), review comments get what is left, and both keep their order.
+    """
+    comments = data.get('comments_url_body') or []
+    pull_request_data = data.get('pull_request_url_body') or {}
+    reviews = [review for review in pull_request_data.get('review_comments_url_body') or [] if review]
+    body = data.get('body') or ""
+    total = (HEADER_TOKENS + estimate_tokens(body) + sum(comment_tokens(c) for c in comments)
+             + sum(comment_tokens(r) for r in reviews))
+    if total <= max_tokens:
+        return data, None
+
+    budget = max_tokens - HEADER_TOKENS
+    new_body = truncate_text(body, budget // 2) if body else body
+    budget -= estimate_tokens(new_body) if new_body else 0
+    closer = (data.get('closed_by') or {}).get('login')
+    kept_comments, budget = _select(comments, closer, budget)
+    kept_reviews, budget = _select(reviews, closer, budget)
+
+    trimmed = dict(data, body=new_body, comments_url_body=[kept_comments[i] for i in sorted(kept_comments)])
+    if 'pull_request_url_body' in data and data['pull_request_url_body']:
+        trimmed['pull_request_url_body'] = dict(
+            pull_request_data, review_comments_url_body=[kept_reviews[i] for i in sorted(kept_reviews)])
+    dropped = {
+        "tokens_before": total,
+        "tokens_after": max_tokens - budget,
+        "body_truncated": new_body != body,
+        "comments": _dropped_ids(comments, kept_comments),
+        "review_comments": _dropped_ids(reviews, kept_reviews),
+        "truncated": _truncated_ids(comments, kept_comments) + _truncated_ids(reviews, kept_reviews),
+    }
+    return trimmed, dropped
+
+
+def omission_note(dropped):
+    """A line telling the model that the summary was shortened, or "" if it was not."""
+    if not dropped:
+        return ""
+    parts = []
+    if dropped["body_truncated"]:
+        parts.append("the middle of the body")
+    if dropped["comments"]:
+        parts.append(f"{len(dropped['comments'])} comments")
+    if dropped["review_comments"]:
+        parts.append(f"{len(dropped['review_comments'])} review comments")
+    if dropped.get("truncated"):
+        parts.append(f"the middle of {len(dropped['truncated'])} long comments")
+    return f"\n(Shortened to fit the prompt: {', '.join(parts)} omitted.)" if parts else ""
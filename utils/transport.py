@@ -0,0 +1,109 @@
+import json
+import asyncio
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class TransportError(Exception):
+    """Raised for connection failures and error status codes, whatever the backend."""
+
+
+class Response:
+    """Minimal response object shared by all transports."""
+
+    def __init__(self, url, status_code, headers, content):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers  # case-insensitive mapping from the underlying client
+        self.content = content
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise TransportError(f"{self.status_code} error for url: {self.url}")
+
+
+class SyncTransport:
+    """Keep-alive transport backed by a pooled requests.Session."""
+
+    def __init__(self, pool_size=10, timeout=10):
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def get(self, url, params=None, headers=None):
+        try:
+            r = self.session.get(url, params=params, headers=headers, timeout=self.timeout)
+        except requests.exceptions.RequestException as e:
+            raise TransportError(str(e)) from e
+        return Response(r.url, r.status_code, r.headers, r.content)
+
+    def post(self, url, json_body, headers=None):
+        try:
+            r = self.session.post(url, json=json_body, headers=headers, timeout=self.timeout)
+        except requests.exceptions.RequestException as e:
+            raise TransportError(str(e)) from e
+        return Response(r.url, r.status_code, r.headers, r.content)
+
+    def close(self):
+        self.session.close()
+
+
+class AsyncTransport:
+    """
+    Transport backed by an httpx.AsyncClient running on a dedicated event loop thread.
+    `get` can be called from any thread; `aget` can be awaited from coroutines on `self.loop`.
+    """
+
+    def __init__(self, pool_size=10, timeout=10):
+        import httpx  # optional dependency, only needed for --transport async
+
+        self._httpx = httpx
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self._thread.start()
+
+        async def make_client():
+            limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+            return httpx.AsyncClient(limits=limits, timeout=timeout)
+
+        self.client = asyncio.run_coroutine_threadsafe(make_client(), self.loop).result()
+
+    async def aget(self, url, params=None, headers=None):
+        try:
+            r = await self.client.get(url, params=params, headers=headers)
+        except self._httpx.HTTPError as e:
+            raise TransportError(str(e)) from e
+        return Response(str(r.url), r.status_code, r.headers, r.content)
+
+    async def apost(self, url, json_body, headers=None):
+        try:
+            r = await self.client.post(url, json=json_body, headers=headers)
+        except self._httpx.HTTPError as e:
+            raise TransportError(str(e)) from e
+        return Response(str(r.url), r.status_code, r.headers, r.content)
+
+    def get(self, url, params=None, headers=None):
+        return asyncio.run_coroutine_threadsafe(self.aget(url, params, headers), self.loop).result()
+
+    def post(self, url, json_body, headers=None):
+        return asyncio.run_coroutine_threadsafe(self.apost(url, json_body, headers), self.loop).result()
+
+    def close(self):
+        asyncio.run_coroutine_threadsafe(self.client.aclose(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+
+
+def create_transport(kind="sync", pool_size=10, timeout=10):
+    """Create the transport selected by the --transport flag."""
+    if kind == "sync":
+        return SyncTransport(pool_size, timeout)
+    if kind == "async":
+        return AsyncTransport(pool_size, timeout)
+    raise ValueError(f"Unknown transport '{kind}', expected 'sync' or 'async'")
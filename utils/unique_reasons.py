@@ -1,15 +1,11 @@
 import json
-import os
 from dotenv import load_dotenv
-import google.generativeai as genai
+from llm_client import create_client
 
 # Load environment variables
 load_dotenv()
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
-# Configure the Gemini API
-genai.configure(api_key=GEMINI_API_KEY)
-model = genai.GenerativeModel('gemini-1.5-pro-latest')
+llm = create_client()
 
 # Load the JSON data from just_reasons.json
 with open("ai_accuracy/just_reasons.json", "r", encoding="utf-8") as f:
@@ -27,11 +23,8 @@ I have a list of reasons for pull request closures. Your task is to analyze them
 Please return a concise list of distinct reasons that generalize the closures. Each unique reason must be 5 words maximum.
 """
 
-# Call the Gemini API
-response = model.generate_content(prompt)
-
-# Extract the unique reasons from the response
-unique_reasons = response.text.strip()
+# Call the Gemini API and extract the unique reasons from the response
+unique_reasons = llm.generate(prompt)
 
 # Save the unique reasons to a JSON file
 output_file = "ai_accuracy/unique_reasons.json"